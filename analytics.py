@@ -0,0 +1,318 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# --- AGREGADOS DE PnL ---
+WIN_DAY_THRESHOLD = 150  # un día es "winning" con PnL >= 150
+
+
+class PnLIndex:
+    # Cubo (fecha, cuenta) -> PnL calculado una vez por versión del journal.
+    # Dashboard, Diario y Cuentas leen de aquí en vez de repetir groupbys.
+    def __init__(self, journal, threshold=WIN_DAY_THRESHOLD):
+        self.threshold = threshold
+        df = journal[['Fecha', 'Cuenta', 'PnL']].copy() if not journal.empty else pd.DataFrame(columns=['Fecha', 'Cuenta', 'PnL'])
+        df['PnL'] = pd.to_numeric(df['PnL'], errors='coerce').fillna(0.0)
+        df['Cuenta'] = df['Cuenta'].astype(str)
+        self.account_totals = df.groupby('Cuenta')['PnL'].sum()
+
+        df['Fecha'] = pd.to_datetime(df['Fecha'], errors='coerce').dt.normalize()
+        df = df.dropna(subset=['Fecha'])
+        self.cube = df.groupby(['Fecha', 'Cuenta'])['PnL'].sum()
+        self.daily = self.cube.groupby(level='Fecha').sum()
+        self.win_days = int((self.daily >= threshold).sum())
+        self.account_win_days = (self.cube >= threshold).groupby(level='Cuenta').sum()
+
+        self._daily = {ts.date(): v for ts, v in self.daily.items()}
+        self._acc_totals = self.account_totals.to_dict()
+        self._acc_wd = {k: int(v) for k, v in self.account_win_days.items()}
+
+    def day(self, d):
+        return self._daily.get(d, 0.0)
+
+    def account_pnl(self, account):
+        return self._acc_totals.get(str(account), 0.0)
+
+    def winning_days(self, account=None):
+        if account is None: return self.win_days
+        return self._acc_wd.get(str(account), 0)
+
+
+# --- MÉTRICAS DE RIESGO ---
+# Todas las dimensiones (cartera, cuenta, estrategia, grupo) en una sola pasada:
+# cada trade se replica una vez por "ámbito" y todo se calcula con groupby/cumsum.
+# El estado por ámbito (equity, pico, rachas, sumas) permite añadir trades nuevos
+# sin recalcular el histórico: el último día queda "abierto" por si llegan más
+# trades de esa fecha.
+TRADING_DAYS = 252
+_TRADE_SEED = {'n': 0, 'wins': 0, 'losses': 0, 'gw': 0.0, 'gl': 0.0, 'run_sign': 0, 'run_len': 0, 'max_w': 0, 'max_l': 0}
+_DAY_SEED = {'days': 0, 's': 0.0, 'ss': 0.0, 'dss': 0.0, 'eq': 0.0, 'peak': 0.0, 'max_dd': 0.0, 'uw': 0, 'max_uw': 0}
+
+
+def _scopes(journal, groups=None):
+    # Trade -> filas (Ámbito, Nombre); los grupos se expanden por cuenta miembro
+    base = pd.DataFrame({'Fecha': pd.to_datetime(journal['Fecha'], errors='coerce').dt.normalize(),
+                         'PnL': pd.to_numeric(journal['PnL'], errors='coerce').fillna(0.0).to_numpy(),
+                         'seq': journal['_seq'].to_numpy() if '_seq' in journal else np.arange(len(journal))}).dropna(subset=['Fecha'])
+    cuenta = journal.loc[base.index, 'Cuenta'].astype(str).to_numpy()
+    parts = [base.assign(Ambito='Total', Nombre='Cartera'),
+             base.assign(Ambito='Cuenta', Nombre=cuenta),
+             base.assign(Ambito='Estrategia', Nombre=journal.loc[base.index, 'Estrategia'].astype(str).to_numpy())]
+    if groups:
+        links = pd.DataFrame([(g, c) for g, m in groups.items() for c in m['Cuenta']], columns=['Nombre', 'Cuenta'])
+        if not links.empty:
+            parts.append(base.assign(Cuenta=cuenta).merge(links, on='Cuenta').drop(columns='Cuenta').assign(Ambito='Grupo'))
+    out = pd.concat(parts, ignore_index=True)
+    out['scope'] = out['Ambito'] + '|' + out['Nombre']
+    return out.sort_values(['scope', 'Fecha', 'seq'], kind='stable').reset_index(drop=True)
+
+
+def _seeded(seed, scopes, defaults):
+    return seed.reindex(scopes).fillna(defaults).astype({k: type(v) for k, v in defaults.items()}) if seed is not None else pd.DataFrame(defaults, index=scopes)
+
+
+def _runs(scope, flag, seed_len):
+    # Longitud acumulada de cada tramo consecutivo de flag (por ámbito); el primer
+    # tramo de cada ámbito continúa el que venía del estado anterior (seed_len).
+    new_run = (flag != np.roll(flag, 1)) | (scope != np.roll(scope, 1))
+    new_run[:1] = True
+    rid = np.cumsum(new_run)
+    pos = pd.Series(1, index=range(len(flag))).groupby(rid).cumsum().to_numpy()
+    first_run = pd.Series(rid).groupby(scope).transform('first').to_numpy() == rid
+    return np.where(flag, pos + np.where(first_run, seed_len, 0), 0)
+
+
+def _trade_stats(t, seed=None):
+    scopes = t['scope'].unique()
+    st = _seeded(seed, scopes, _TRADE_SEED)
+    if t.empty: return st
+    p = t['PnL'].to_numpy(); sc = t['scope'].to_numpy()
+    g = t.assign(w=p > 0, l=p < 0, gw=np.where(p > 0, p, 0.0), gl=np.where(p < 0, p, 0.0)).groupby('scope')
+    agg = g.agg(n=('PnL', 'size'), wins=('w', 'sum'), losses=('l', 'sum'), gw=('gw', 'sum'), gl=('gl', 'sum')).reindex(scopes)
+    for c in ['n', 'wins', 'losses', 'gw', 'gl']: st[c] = st[c] + agg[c].to_numpy()
+    sign = np.sign(p).astype(int)
+    seed_sign = st['run_sign'].reindex(sc).to_numpy(); seed_len = st['run_len'].reindex(sc).to_numpy()
+    win_run = _runs(sc, sign > 0, np.where(seed_sign > 0, seed_len, 0))
+    loss_run = _runs(sc, sign < 0, np.where(seed_sign < 0, seed_len, 0))
+    runs = pd.DataFrame({'scope': sc, 'w': win_run, 'l': loss_run, 'sign': sign}).groupby('scope')
+    st['max_w'] = np.maximum(st['max_w'], runs['w'].max().reindex(scopes).to_numpy())
+    st['max_l'] = np.maximum(st['max_l'], runs['l'].max().reindex(scopes).to_numpy())
+    last = runs.last().reindex(scopes)
+    st['run_sign'] = last['sign'].to_numpy()
+    st['run_len'] = np.where(last['sign'] > 0, last['w'], np.where(last['sign'] < 0, last['l'], 0))
+    return st
+
+
+def _day_stats(d, seed=None):
+    scopes = d['scope'].unique()
+    st = _seeded(seed, scopes, _DAY_SEED)
+    if d.empty: return st
+    p = d['PnL'].to_numpy(); sc = d['scope'].to_numpy()
+    eq = st['eq'].reindex(sc).to_numpy() + d.groupby('scope')['PnL'].cumsum().to_numpy()
+    peak = np.maximum(st['peak'].reindex(sc).to_numpy(), pd.Series(eq).groupby(sc).cummax().to_numpy())
+    dd = eq - peak
+    uw = _runs(sc, dd < 0, st['uw'].reindex(sc).to_numpy())
+    frame = pd.DataFrame({'scope': sc, 'p': p, 'p2': p * p, 'dn2': np.minimum(p, 0) ** 2, 'eq': eq, 'peak': peak, 'dd': dd, 'uw': uw})
+    g = frame.groupby('scope')
+    agg = g.agg(days=('p', 'size'), s=('p', 'sum'), ss=('p2', 'sum'), dss=('dn2', 'sum'), min_dd=('dd', 'min'), mx_uw=('uw', 'max')).reindex(scopes)
+    last = g.last().reindex(scopes)
+    for c in ['days', 's', 'ss', 'dss']: st[c] = st[c] + agg[c].to_numpy()
+    st['max_dd'] = np.minimum(st['max_dd'], agg['min_dd'].to_numpy())
+    st['max_uw'] = np.maximum(st['max_uw'], agg['mx_uw'].to_numpy())
+    st['eq'] = last['eq'].to_numpy(); st['peak'] = last['peak'].to_numpy(); st['uw'] = last['uw'].to_numpy()
+    return st
+
+
+def _combine(base, update):
+    if base is None: return update
+    return pd.concat([base.drop(update.index, errors='ignore'), update])
+
+
+class _Replay:
+    # Estado alimentado por el journal. Si sólo se han añadido trades al final (con
+    # fecha >= la última vista), se procesan únicamente esos; si no, se recalcula todo.
+    # "Sólo se han añadido" se comprueba con un hash por fila (con su posición) de las
+    # columnas que entran en el cálculo: editar cuenta, estrategia, fecha o PnL de un
+    # trade, o intercambiar dos, cambia la huella del prefijo y fuerza el recálculo.
+    def __init__(self, journal):
+        self.version = None
+        self._lock = threading.Lock()
+        self.rebuild(journal)
+
+    def rebuild(self, journal, hashes=None):
+        self._reset()
+        self.last_date = None
+        self.n = len(journal)
+        self._fingerprint = _fp(_row_hashes(journal) if hashes is None else hashes, self.n)
+        self._ingest(self._rows(journal))
+
+    def sync(self, journal, version=None):
+        with self._lock:
+            if version is None or version != self.version: self._sync(journal)
+            self.version = version
+        return self
+
+    def _sync(self, journal):
+        n0 = self.n
+        hashes = _row_hashes(journal)
+        if len(journal) < n0 or _fp(hashes, n0) != self._fingerprint: return self.rebuild(journal, hashes)
+        if len(journal) == n0: return
+        tail = journal.iloc[n0:]
+        if self.last_date is not None and pd.to_datetime(tail['Fecha'], errors='coerce').min() < self.last_date:
+            return self.rebuild(journal, hashes)
+        self.n = len(journal)
+        self._fingerprint = _fp(hashes, self.n)
+        self._ingest(self._rows(tail.assign(_seq=np.arange(n0, len(journal)))))
+
+
+_FP_COLS = ['Fecha', 'Cuenta', 'Estrategia', 'PnL']
+
+
+def _row_hashes(journal):
+    # El índice posicional entra en el hash: el orden de los trades importa (rachas)
+    cols = [c for c in _FP_COLS if c in journal]
+    return pd.util.hash_pandas_object(journal[cols].reset_index(drop=True), index=True).to_numpy()
+
+
+def _fp(hashes, n):
+    return (n, int(hashes[:n].sum()))
+
+
+class RiskMetrics(_Replay):
+    def __init__(self, journal, groups=None):
+        self.groups = groups
+        super().__init__(journal)
+
+    def _reset(self):
+        self.trades = self.closed = self.open_day = None
+
+    def _rows(self, journal):
+        return _scopes(journal, self.groups)
+
+    def _ingest(self, rows):
+        if rows.empty: return
+        self.trades = _combine(self.trades, _trade_stats(rows, self.trades))
+        days = rows.groupby(['scope', 'Fecha'], sort=True)['PnL'].sum().reset_index()
+        if self.open_day is not None:
+            days = pd.concat([self.open_day[self.open_day['scope'].isin(days['scope'])], days])
+            days = days.groupby(['scope', 'Fecha'], sort=True)['PnL'].sum().reset_index()
+        is_last = days.groupby('scope').cumcount(ascending=False) == 0
+        self.closed = _combine(self.closed, _day_stats(days[~is_last], self.closed))
+        keep = self.open_day[~self.open_day['scope'].isin(days['scope'])] if self.open_day is not None else None
+        self.open_day = pd.concat([keep, days[is_last]], ignore_index=True) if keep is not None else days[is_last].reset_index(drop=True)
+        self.last_date = self.open_day['Fecha'].max()
+
+    def table(self):
+        # Una fila por ámbito con todas las métricas
+        if self.trades is None: return pd.DataFrame()
+        with self._lock: return self._table()
+
+    def _table(self):
+        days = _combine(self.closed, _day_stats(self.open_day, self.closed))
+        t = self.trades; d = days.reindex(t.index)
+        mean = d['s'] / d['days']
+        std = np.sqrt(((d['ss'] - d['days'] * mean ** 2) / (d['days'] - 1)).clip(lower=0))
+        down = np.sqrt(d['dss'] / d['days'])
+        ambito, nombre = zip(*(s.split('|', 1) for s in t.index))
+        out = pd.DataFrame({
+            'Ámbito': ambito, 'Nombre': nombre, 'Trades': t['n'].astype(int), 'PnL': (t['gw'] + t['gl']).round(2),
+            'Win %': (t['wins'] / t['n'] * 100).round(1), 'Expectancy': ((t['gw'] + t['gl']) / t['n']).round(2),
+            'Profit Factor': (t['gw'] / -t['gl']).replace(np.inf, np.nan).round(2),
+            'Max DD': d['max_dd'].round(2), 'DD Días': d['max_uw'].astype(int),
+            'Sharpe': (mean / std * np.sqrt(TRADING_DAYS)).replace([np.inf, -np.inf], np.nan).round(2),
+            'Sortino': (mean / down * np.sqrt(TRADING_DAYS)).replace([np.inf, -np.inf], np.nan).round(2),
+            'Racha W': t['max_w'].astype(int), 'Racha L': t['max_l'].astype(int),
+        }, index=t.index)
+        order = {'Total': 0, 'Cuenta': 1, 'Estrategia': 2, 'Grupo': 3}
+        return out.sort_values(['Ámbito', 'Nombre'], key=lambda s: s.map(order) if s.name == 'Ámbito' else s).reset_index(drop=True)
+
+
+# --- REGLAS DE PROP FIRM (TRAILING DD / PÉRDIDA DIARIA) ---
+# Se reproduce el journal trade a trade por cuenta: balance = inicial + PnL
+# acumulado, pico (HWM) = máximo acumulado y suelo = pico - DD_Max, que deja de
+# subir al llegar al balance inicial + TRAIL_LOCK. La pérdida diaria se mide con
+# el PnL acumulado dentro del día (sólo trades cerrados, no flotante).
+TRAIL_LOCK = 0.0
+_RULE_SEED = {'bal': 0.0, 'hwm': 0.0, 'max_dd': 0.0, 'day_pnl': 0.0, 'day_hit': False, 'dl_days': 0}
+
+
+def _account_rows(journal):
+    base = pd.DataFrame({'Fecha': pd.to_datetime(journal['Fecha'], errors='coerce').dt.normalize(),
+                         'Cuenta': journal['Cuenta'].astype(str).to_numpy(),
+                         'PnL': pd.to_numeric(journal['PnL'], errors='coerce').fillna(0.0).to_numpy(),
+                         'seq': journal['_seq'].to_numpy() if '_seq' in journal else np.arange(len(journal))}).dropna(subset=['Fecha'])
+    return base.sort_values(['Cuenta', 'Fecha', 'seq'], kind='stable').reset_index(drop=True)
+
+
+class RuleTracker(_Replay):
+    # accounts: Nombre, Balance_Inicial, DD_Max (0 = sin trailing), Limite_Diario (0 = sin límite)
+    def __init__(self, accounts, journal, lock=TRAIL_LOCK):
+        acc = accounts.drop_duplicates('Nombre').assign(Nombre=lambda d: d['Nombre'].astype(str)).set_index('Nombre')
+        self.rules = pd.DataFrame({c: pd.to_numeric(acc.get(c, 0.0), errors='coerce') for c in ['Balance_Inicial', 'DD_Max', 'Limite_Diario']},
+                                  index=acc.index).fillna(0.0)
+        self.lock = lock
+        super().__init__(journal)
+
+    def _reset(self):
+        st = pd.DataFrame(_RULE_SEED, index=self.rules.index)
+        st['bal'] = st['hwm'] = self.rules['Balance_Inicial']
+        st['day'] = st['breach'] = st['dl_last'] = pd.NaT
+        self.state = st
+
+    def _rows(self, journal):
+        rows = _account_rows(journal)
+        return rows[rows['Cuenta'].isin(self.rules.index)].reset_index(drop=True)
+
+    def _floor(self, hwm, rules):
+        return np.minimum(hwm - rules['DD_Max'].to_numpy(), rules['Balance_Inicial'].to_numpy() + self.lock)
+
+    def _ingest(self, rows):
+        if rows.empty: return
+        st = self.state
+        acc = rows['Cuenta'].to_numpy(); day = rows['Fecha'].to_numpy()
+        rules = self.rules.reindex(acc); seed = st.reindex(acc)
+        bal = seed['bal'].to_numpy() + rows.groupby('Cuenta', sort=False)['PnL'].cumsum().to_numpy()
+        hwm = np.maximum(seed['hwm'].to_numpy(), pd.Series(bal).groupby(acc).cummax().to_numpy())
+        burnt = (rules['DD_Max'].to_numpy() > 0) & (bal <= self._floor(hwm, rules))
+        # El primer día del lote puede continuar el día abierto del estado
+        cont = day == seed['day'].to_numpy()
+        day_cum = rows.groupby(['Cuenta', 'Fecha'], sort=False)['PnL'].cumsum().to_numpy() + np.where(cont, seed['day_pnl'].to_numpy(), 0.0)
+        limit = rules['Limite_Diario'].to_numpy()
+        over = (limit > 0) & (day_cum <= -limit)
+
+        f = pd.DataFrame({'Cuenta': acc, 'Fecha': day, 'bal': bal, 'hwm': hwm, 'dd': bal - hwm, 'burnt': burnt,
+                          'day_cum': day_cum, 'over': over, 'cont': cont, 'seen': cont & seed['day_hit'].to_numpy()})
+        g = f.groupby('Cuenta', sort=False)
+        last = g.last()
+        st.loc[last.index, 'bal'] = last['bal']; st.loc[last.index, 'hwm'] = last['hwm']
+        st.loc[last.index, 'max_dd'] = np.minimum(st.loc[last.index, 'max_dd'], g['dd'].min())
+        first_burn = f[f['burnt']].groupby('Cuenta')['Fecha'].min()
+        new_burn = first_burn[st.loc[first_burn.index, 'breach'].isna()]
+        st.loc[new_burn.index, 'breach'] = new_burn
+
+        days = f.groupby(['Cuenta', 'Fecha'], sort=False).agg(hit=('over', 'any'), seen=('seen', 'any'), pnl=('day_cum', 'last'))
+        new_hits = days[days['hit'] & ~days['seen']].reset_index()
+        if not new_hits.empty:
+            cnt = new_hits.groupby('Cuenta')['Fecha'].agg(['size', 'max'])
+            st.loc[cnt.index, 'dl_days'] = st.loc[cnt.index, 'dl_days'] + cnt['size']
+            st.loc[cnt.index, 'dl_last'] = cnt['max']
+        open_day = days.reset_index().groupby('Cuenta', sort=False).last()
+        st.loc[open_day.index, 'day'] = open_day['Fecha']
+        st.loc[open_day.index, 'day_pnl'] = open_day['pnl']
+        st.loc[open_day.index, 'day_hit'] = open_day['hit'] | open_day['seen']
+        self.last_date = f['Fecha'].max() if self.last_date is None else max(self.last_date, f['Fecha'].max())
+
+    def table(self, today=None):
+        # Una fila por cuenta: balance reproducido, pico, suelo, margen y violaciones
+        with self._lock: st = self.state.copy()
+        r = self.rules
+        has_dd = r['DD_Max'] > 0
+        floor = pd.Series(self._floor(st['hwm'].to_numpy(), r), index=st.index).where(has_dd)
+        today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+        day_pnl = st['day_pnl'].where(st['day'] == today, 0.0)
+        return pd.DataFrame({
+            'Balance': st['bal'].round(2), 'HWM': st['hwm'].round(2), 'Suelo': floor.round(2),
+            'Margen': (st['bal'] - floor).round(2), 'Max_DD': st['max_dd'].round(2), 'Quemada': st['breach'],
+            'PnL_Hoy': day_pnl.round(2), 'Restante_Hoy': (r['Limite_Diario'] + day_pnl).where(r['Limite_Diario'] > 0).round(2),
+            'Dias_Limite': st['dl_days'].astype(int), 'Ultimo_Limite': st['dl_last'],
+        }, index=st.index)
@@ -0,0 +1,460 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import date
+import numpy as np
+import pandas as pd
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import a1_to_rowcol
+from schema import TABS, COLS, to_rows, to_typed
+from storage import SheetsBackend, SQLiteBackend
+from cache import TabCache
+from snapshot import SnapshotStore
+from write_queue import WriteBehind
+from analytics import PnLIndex, RiskMetrics, RuleTracker
+from equity import PORTFOLIO, EquityCurves
+from finance import pending_expenses
+from journal import fan_out, resolve_groups
+from grid import apply_edits, filter_frame, page_of
+from montecarlo import build_jobs, run
+from calendar_view import DAYS_SHORT, agenda_cell, month_html, pnl_cell, renewals_by_day, tasks_by_date, year_html
+
+# --- BENCHMARK ---
+# Genera datos sintéticos de las seis pestañas, los sirve desde un gspread en
+# memoria (cuenta las llamadas a la API) y mide latencia, pico de memoria y
+# llamadas por paso: carga/guardado, cálculos de cada página y, con --app, el
+# render completo de cada página con AppTest.
+#   python bench.py --rows 100,10000,100000 --accounts 200 --json out.json
+#   python bench.py --rows 100000 --compare out.json   (marca regresiones)
+SIZES = [100, 10_000, 100_000]
+ACCOUNTS = 200
+TOLERANCE = 0.25  # +25% de tiempo sobre la referencia = regresión
+FAILED = []  # comprobaciones de resultados que no cuadran
+
+ASSETS = ['NQ', 'MNQ', 'ES', 'MES', 'YM', 'CL', 'GC']
+STRATEGIES = ['RANGOS', 'CANALES', 'TENDENCIA', 'NOTICIAS', 'OTRO']
+FIRMS = ['Apex', 'Topstep', 'MyFundedFutures', 'Tradeify', 'Bulenox']
+EMOTIONS = ['', '', '', 'Calma', 'FOMO', 'Miedo', 'Venganza']
+
+
+# --- DATOS SINTÉTICOS ---
+def synth(rows, accounts=ACCOUNTS, seed=0, today=None):
+    rng = np.random.default_rng(seed)
+    today = pd.Timestamp(today or date.today()).normalize()
+    names = np.array([f"{FIRMS[i % len(FIRMS)]} {i + 1:03d}" for i in range(accounts)])
+    # ~20 trades por día operado en toda la cartera (mínimo un año de historia)
+    days = pd.bdate_range(end=today, periods=max(250, rows // 20))
+    pnl = np.round(rng.normal(35, 320, rows), 2)
+    risk = rng.choice([150.0, 200.0, 250.0, 300.0], rows)
+    journal = pd.DataFrame({
+        'Fecha': np.sort(rng.choice(days.values, rows)), 'Cuenta': rng.choice(names, rows),
+        'Activo': rng.choice(ASSETS, rows), 'Estrategia': rng.choice(STRATEGIES, rows),
+        'Resultado': np.where(pnl > 0, 'WIN', np.where(pnl < 0, 'LOSS', 'BE')), 'RR': np.round(pnl / risk, 2), 'PnL': pnl,
+        'Emociones': rng.choice(EMOTIONS, rows), 'Screenshot': '',
+        'Notas': np.where(rng.random(rows) < 0.2, 'Entrada tardía, gestionar mejor el parcial', ''),
+    })
+
+    size = rng.choice([25_000.0, 50_000.0, 100_000.0, 150_000.0], accounts)
+    acc = pd.DataFrame({
+        'Nombre': names, 'Empresa': [n.split(' ')[0] for n in names], 'Tipo': rng.choice(['Examen', 'Funded'], accounts, p=[0.7, 0.3]),
+        'Balance_Inicial': size, 'Balance_Actual': size + np.round(rng.normal(500, 1500, accounts), 2),
+        'Balance_Objetivo': size * 1.06, 'Dias_Objetivo': rng.choice([5, 7, 10], accounts),
+        'Costo': rng.choice([99.0, 147.0, 167.0, 297.0], accounts), 'Estado': rng.choice(['Activa', 'Historico'], accounts, p=[0.8, 0.2]),
+        'Fecha_Creacion': rng.choice(days[: max(1, len(days) // 2)].values, accounts), 'Manual_WD': rng.integers(0, 3, accounts),
+        'DD_Max': size * 0.05, 'Limite_Diario': np.where(rng.random(accounts) < 0.5, size * 0.02, 0.0),
+    })
+
+    n_fin = max(10, rows // 50)
+    fin_type = rng.choice(['GASTO (Cuenta)', 'GASTO (Suscripción)', 'INGRESO (Payout)'], n_fin, p=[0.5, 0.3, 0.2])
+    finance = pd.DataFrame({
+        'Fecha': np.sort(rng.choice(days.values, n_fin)), 'Tipo': fin_type,
+        'Concepto': rng.choice(['Compra cuenta', 'Reset', 'Payout', 'TradingView', 'Datos CME'], n_fin),
+        'Monto': np.where(fin_type == 'INGRESO (Payout)', rng.uniform(500, 5000, n_fin), -rng.uniform(20, 300, n_fin)).round(2),
+    })
+
+    n_obj = 300
+    objectives = pd.DataFrame({
+        'ID': np.arange(1, n_obj + 1), 'Tarea': [f"Tarea {i}" for i in range(1, n_obj + 1)], 'Tipo': 'Diario',
+        'Fecha_Limite': rng.choice(pd.date_range(today - pd.Timedelta(days=180), today + pd.Timedelta(days=180)).values, n_obj),
+        'Estado': rng.choice(['Pendiente', 'Hecho'], n_obj), 'Target_Dinero': 0.0,
+    })
+    objectives.loc[n_obj - 1, ['ID', 'Tipo', 'Estado', 'Target_Dinero']] = [999, 'META_ANUAL', 'Active', 50_000.0]
+
+    subs = pd.DataFrame({'Servicio': ['TradingView', 'Datos CME', 'NinjaTrader', 'Discord Pro', 'VPS', 'Journal Pro'],
+                         'Monto': [29.95, 39.0, 99.0, 9.99, 25.0, 19.0], 'Dia_Renovacion': [1, 5, 12, 15, 20, 28]})
+
+    n_grp = max(1, min(20, accounts // 10))
+    groups = pd.DataFrame({
+        'Nombre_Grupo': [f"Copy {i + 1}" for i in range(n_grp)],
+        'Cuentas': [",".join(f"{a}:{m:g}" if m != 1 else a for a, m in zip(rng.choice(names, min(8, accounts), replace=False), rng.choice([1, 1, 2, 0.5], min(8, accounts))))
+                    for _ in range(n_grp)],
+    })
+    return {'journal': journal, 'accounts': acc, 'finance': finance, 'objectives': objectives, 'subs': subs, 'groups': groups}
+
+
+# --- GSPREAD EN MEMORIA ---
+# Lo justo de la API de gspread que usa storage.SheetsBackend; cada método que en
+# la librería real es una petición HTTP suma uno en `calls`.
+class FakeWorksheet:
+    def __init__(self, title, calls, rows=100, cols=20):
+        self.title = title
+        self.calls = calls
+        self.values = []
+        self.row_count, self.col_count = rows, cols
+
+    def _fit(self):
+        self.row_count = max(self.row_count, len(self.values))
+        self.col_count = max([self.col_count] + [len(r) for r in self.values[:1]])
+
+    def _write(self, a1, block):
+        r0, c0 = a1_to_rowcol(a1.split(':')[0])
+        for i, row in enumerate(block):
+            r = r0 - 1 + i
+            while len(self.values) <= r: self.values.append([])
+            cur = self.values[r]
+            if len(cur) < c0 - 1 + len(row): cur.extend([''] * (c0 - 1 + len(row) - len(cur)))
+            cur[c0 - 1: c0 - 1 + len(row)] = ['' if v is None else str(v) for v in row]
+        self._fit()
+
+    def get_all_values(self):
+        self.calls['values.get'] += 1
+        return [list(r) for r in self.values]
+
+    def append_row(self, row, **kw):
+        self.calls['values.append'] += 1
+        self.values.append([str(v) for v in row]); self._fit()
+
+    def append_rows(self, rows, **kw):
+        self.calls['values.append'] += 1
+        self.values.extend([['' if v is None else str(v) for v in r] for r in rows]); self._fit()
+
+    def update(self, values, range_name='A1', **kw):
+        self.calls['values.update'] += 1
+        self._write(range_name, values)
+
+    def batch_update(self, data, **kw):
+        self.calls['values.batchUpdate'] += 1
+        for d in data: self._write(d['range'], d['values'])
+
+    def batch_clear(self, ranges):
+        self.calls['values.batchClear'] += 1
+        for rg in ranges:
+            a, _, b = rg.partition(':')
+            b = b or a
+            r0, c0 = a1_to_rowcol(a)
+            # "A101:T" = abierto por abajo
+            (r1, c1) = a1_to_rowcol(b) if any(ch.isdigit() for ch in b) else (len(self.values), a1_to_rowcol(b + '1')[1])
+            for r in range(r0 - 1, min(r1, len(self.values))):
+                row = self.values[r]
+                for c in range(c0 - 1, min(c1, len(row))): row[c] = ''
+        while self.values and not any(self.values[-1]): self.values.pop()
+
+
+class FakeSpreadsheet:
+    def __init__(self, calls):
+        self.calls = calls
+        self.tabs = {}
+
+    def worksheets(self):
+        self.calls['metadata.get'] += 1
+        return list(self.tabs.values())
+
+    def worksheet(self, title):
+        self.calls['metadata.get'] += 1
+        if title not in self.tabs: raise WorksheetNotFound(title)
+        return self.tabs[title]
+
+    def add_worksheet(self, title, rows=100, cols=20):
+        self.calls['batchUpdate.addSheet'] += 1
+        self.tabs[title] = FakeWorksheet(title, self.calls, rows, cols)
+        return self.tabs[title]
+
+    def values_batch_update(self, body):
+        self.calls['values.batchUpdate'] += 1
+        for d in body['data']:
+            title, _, rng = d['range'].rpartition('!')
+            self.tabs[title.strip("'")]._write(rng, d['values'])
+
+    def values_batch_get(self, ranges, params=None):
+        self.calls['values.batchGet'] += 1
+        out = []
+        for r in ranges:
+            ws = self.tabs[r.strip("'")]
+            vals = [list(v) for v in ws.values]
+            while vals and not any(vals[-1]): vals.pop()
+            out.append({'range': r, 'values': vals})
+        return {'valueRanges': out}
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = Counter()
+        self.sheet = FakeSpreadsheet(self.calls)
+
+    def open(self, name):
+        self.calls['files.open'] += 1
+        return self.sheet
+
+    def seed(self, frames):
+        # Carga directa (sin contar llamadas), como una hoja ya existente
+        for key, df in frames.items():
+            ws = FakeWorksheet(TABS[key], self.calls)
+            ws.values = [list(COLS[key])] + [['' if v is None else str(v) for v in r] for r in to_rows(df[COLS[key]])]
+            ws._fit()
+            self.sheet.tabs[TABS[key]] = ws
+
+
+# --- MEDICIÓN ---
+class Report:
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.rows = []
+
+    def step(self, size, section, name, fn, calls=None):
+        before = sum(calls.values()) if calls is not None else 0
+        if self.memory: tracemalloc.start()
+        t = time.perf_counter()
+        out = fn()
+        ms = (time.perf_counter() - t) * 1000
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20 if self.memory else float('nan')
+        if self.memory: tracemalloc.stop()
+        api = sum(calls.values()) - before if calls is not None else None
+        self.rows.append({'rows': size, 'section': section, 'step': name, 'ms': round(ms, 2), 'peak_mb': round(peak, 2), 'api': api})
+        return out
+
+    def frame(self):
+        return pd.DataFrame(self.rows, columns=['rows', 'section', 'step', 'ms', 'peak_mb', 'api'])
+
+
+def _edit_one(df):
+    out = df.copy()
+    out.loc[out.index[len(out) // 2], 'Notas'] = 'editado en benchmark'
+    return out
+
+
+def _move_one(df, col):
+    # Un trade cambia de cuenta/estrategia: mismo número de filas y mismo PnL total
+    out = df.copy()
+    i = out.index[len(out) // 2]
+    out[col] = out[col].astype(str)
+    out.loc[i, col] = next(v for v in out[col].unique() if v != out.loc[i, col])
+    return out
+
+
+def check(name, got, expected):
+    # Lo incremental debe dar lo mismo que un recálculo desde cero
+    try: pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+    except AssertionError as e:
+        print(f"  ! {name}: difiere del recálculo completo\n{e}", file=sys.stderr)
+        FAILED.append(name)
+
+
+def _during_slow_read(backend, client, keys, write):
+    # Una lectura (como la del hilo de reconciliación) toma las celdas, la escritura se
+    # completa y sólo entonces llega la respuesta de la lectura
+    read, release = threading.Event(), threading.Event()
+    fetch = client.sheet.values_batch_get
+
+    def slow(ranges, params=None):
+        resp = fetch(ranges, params)
+        read.set(); release.wait()
+        return resp
+    client.sheet.values_batch_get = slow
+    reader = threading.Thread(target=backend.load_many, args=(keys,))
+    reader.start(); read.wait()
+    try: write()
+    finally:
+        release.set(); reader.join()
+        client.sheet.values_batch_get = fetch
+
+
+def check_stale_reads(frames):
+    # Una foto leída antes de una escritura no puede sustituir a la de la escritura:
+    # el siguiente alta pisaría los trades recién añadidos y el diff no vería cambios reales
+    journal = frames['journal'].head(20)
+    client = FakeClient(); client.seed({'journal': journal})
+    backend = SheetsBackend(lambda: client, 'bench')
+    base = backend.load('journal')
+    ws = client.sheet.tabs[TABS['journal']]
+    first, second = journal.head(3).assign(Notas='alta 1'), journal.head(3).assign(Notas='alta 2')
+    _during_slow_read(backend, client, ['journal'], lambda: backend.append(first, 'journal'))
+    backend.append(second, 'journal')
+    notes = [r[COLS['journal'].index('Notas')] for r in ws.values[1:]]
+    if len(notes) != len(journal) + 6 or notes[-6:] != ['alta 1'] * 3 + ['alta 2'] * 3:
+        print(f"  ! alta tras lectura cruzada: {len(notes)} filas, esperadas {len(journal) + 6}", file=sys.stderr)
+        FAILED.append('alta tras lectura cruzada')
+
+    frame = backend.load('journal')
+    edited = frame.copy(); edited.loc[0, 'Notas'] = 'editado'
+    _during_slow_read(backend, client, ['journal'], lambda: backend.save(edited, 'journal'))
+    backend.save(frame, 'journal')  # vuelve al valor de antes de la escritura
+    if ws.values[1][COLS['journal'].index('Notas')] != str(base.loc[0, 'Notas']):
+        print("  ! guardado tras lectura cruzada: la hoja conserva el valor intermedio", file=sys.stderr)
+        FAILED.append('guardado tras lectura cruzada')
+
+
+def check_editor_save(frames):
+    # Un alta desde el editor ensancha RR a float64: al guardar sólo debe cambiar la
+    # fila nueva, no reescribirse la columna con el ruido de float32
+    journal = frames['journal'].head(20)
+    client = FakeClient(); client.seed({'journal': journal})
+    backend = SheetsBackend(lambda: client, 'bench')
+    full = backend.load('journal')
+    ws = client.sheet.tabs[TABS['journal']]
+    before = [list(r) for r in ws.values]
+    row = {c: str(v) for c, v in zip(COLS['journal'], to_rows(full.tail(1))[0])}
+    edited = apply_edits(full, full, {'added_rows': [dict(row, Notas='alta editor')]})
+    backend.save(edited, 'journal')
+    changed = [i for i, r in enumerate(ws.values[:len(before)]) if r != before[i]]
+    if changed or len(ws.values) != len(before) + 1:
+        print(f"  ! guardado tras alta en el editor: {len(changed)} filas existentes reescritas", file=sys.stderr)
+        FAILED.append('guardado tras alta en el editor')
+
+
+def bench_storage(rep, size, frames, workdir):
+    # Sheets (falso, con recuento de llamadas) y SQLite: carga fría, rerun caliente,
+    # edición de una fila, alta de trades y recarga forzada.
+    new_trades = frames['journal'].tail(10).assign(Notas='alta benchmark')
+    client = FakeClient(); client.seed(frames)
+    sqlite = SQLiteBackend(os.path.join(workdir, f"bench_{size}.db"))
+    for key, df in frames.items(): sqlite.save(df, key)
+    for label, backend, calls in [('sheets', SheetsBackend(lambda: client, 'bench'), client.calls), ('sqlite', sqlite, None)]:
+        cache = TabCache(backend)
+        writer = WriteBehind(backend, cache, coalesce=0.0)
+        tabs = rep.step(size, label, 'carga fría (6 pestañas)', lambda: cache.get(list(TABS)), calls)
+        rep.step(size, label, 'rerun (caché)', lambda: cache.get(list(TABS)), calls)
+        journal = tabs['journal']
+        rep.step(size, label, 'save_data: 1 fila editada', lambda: (writer.submit('journal', _edit_one(journal)), writer.flush()), calls)
+        full = pd.concat([cache.get(['journal'])['journal'], new_trades], ignore_index=True)
+        rep.step(size, label, 'append_data: 10 trades', lambda: (writer.submit_append('journal', new_trades, full), writer.flush()), calls)
+        cache.invalidate()
+        rep.step(size, label, 'Sincronizar (recarga)', lambda: cache.get(list(TABS)), calls)
+    # Arranque en caliente desde la copia local Parquet
+    store = SnapshotStore(os.path.join(workdir, f"snap_{size}"))
+    for key, df in frames.items(): store.save(key, df)
+    rep.step(size, 'snapshot', 'arranque desde Parquet (6 pestañas)', lambda: {k: store.load(k) for k in TABS})
+
+
+def bench_pages(rep, size, frames):
+    # Cálculos de cada página sobre los marcos ya tipados (lo que queda tras la carga)
+    f = {k: to_typed(pd.DataFrame(to_rows(df), columns=list(df.columns)), k) for k, df in frames.items()}
+    j, acc, groups = f['journal'], f['accounts'], f['groups']
+    today = date.today()
+    active = acc[acc['Estado'] == 'Activa']
+    members = rep.step(size, 'común', 'resolve_groups', lambda: resolve_groups(groups))
+
+    pidx = rep.step(size, 'Dashboard', 'PnLIndex', lambda: PnLIndex(j))
+    curves = rep.step(size, 'Dashboard', 'EquityCurves', lambda: EquityCurves(j, members))
+    rep.step(size, 'Dashboard', 'curva cartera (LTTB)', lambda: curves.curve(PORTFOLIO))
+    rep.step(size, 'Dashboard', 'superponer 5 cuentas', lambda: curves.overlay(curves.names('Cuenta')[:5]))
+
+    cell = agenda_cell(tasks_by_date(f['objectives']), renewals_by_day(f['subs']))
+    rep.step(size, 'Agenda', 'calendario mes + año', lambda: (month_html(today.year, today.month, cell), year_html(today.year, cell)))
+
+    rm = rep.step(size, 'Insights', 'RiskMetrics', lambda: RiskMetrics(j, members))
+    rep.step(size, 'Insights', 'tabla de métricas', rm.table)
+
+    rep.step(size, 'Diario', 'calendario PnL (año)', lambda: year_html(today.year, pnl_cell(pidx.day), DAYS_SHORT))
+    rep.step(size, 'Diario', 'filtrar + página', lambda: page_of(filter_frame(j, 'Fecha', filters={'Estrategia': ['RANGOS']}), 1, 50, 'Fecha'))
+    g0 = next(iter(members.values())) if members else pd.DataFrame({'Cuenta': acc['Nombre'][:3], 'Mult': 1.0})
+    rep.step(size, 'Diario', 'fan_out a grupo', lambda: fan_out(j.iloc[-1].to_dict(), g0))
+
+    rules = rep.step(size, 'Cuentas', 'RuleTracker', lambda: RuleTracker(acc, j))
+    rep.step(size, 'Cuentas', 'tabla de reglas', rules.table)
+    more = j.tail(10)
+    grown = pd.concat([j, more], ignore_index=True)
+    rep.step(size, 'Cuentas', 'sync incremental (+10 trades)', lambda: rules.sync(grown, 1))
+    check(f"RuleTracker incremental ({size})", rules.table(today), RuleTracker(acc, grown).table(today))
+    rep.step(size, 'Insights', 'sync incremental (+10 trades)', lambda: rm.sync(grown, 1))
+    moved = _move_one(grown, 'Cuenta')
+    rep.step(size, 'Insights', 'sync tras editar un trade', lambda: rm.sync(moved, 2))
+    check(f"RiskMetrics incremental ({size})", rm.table(), RiskMetrics(moved, members).table())
+    rep.step(size, 'Cuentas', 'sync tras editar un trade', lambda: rules.sync(moved, 2))
+    check(f"RuleTracker tras editar ({size})", rules.table(today), RuleTracker(acc, moved).table(today))
+    wd = {n: pidx.winning_days(n) for n in active['Nombre'][:10]}
+    rep.step(size, 'Cuentas', 'Monte Carlo (10 cuentas, 2000 caminos)',
+             lambda: run(build_jobs(active.head(10), j, win_days=wd, paths=2000, horizon=60)))
+
+    rep.step(size, 'Finanzas', 'gastos pendientes (año)', lambda: pending_expenses(f['subs'], f['finance'], date(today.year, 1, 1)))
+    rep.step(size, 'Finanzas', 'filtrar + página', lambda: page_of(filter_frame(f['finance'], 'Fecha'), 1, 50, 'Fecha'))
+
+
+_APP = {}
+
+
+def app_client():
+    # Factoría que usa la app en bench_app (TRADING_CLIENT_FACTORY=bench:app_client)
+    return _APP['client']
+
+
+def bench_app(rep, size, frames, workdir):
+    # Render completo de cada página (Streamlit AppTest) contra el gspread en memoria:
+    # cada paso cuenta también sus llamadas a la API de Sheets
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    # get_storage/get_cache son cache_resource del proceso: sin limpiar, la app
+    # seguiría sirviendo los datos del tamaño anterior
+    st.cache_resource.clear(); st.cache_data.clear()
+    client = FakeClient(); client.seed(frames)
+    _APP['client'] = client
+    sys.modules.setdefault('bench', sys.modules[__name__])  # con `python bench.py` este módulo es __main__
+    os.environ.update(TRADING_STORAGE='sheets', TRADING_CLIENT_FACTORY='bench:app_client',
+                      TRADING_SNAPSHOT_DIR=os.path.join(workdir, f"app_snap_{size}"))
+    here = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trading_app.py')
+    at = rep.step(size, 'app', 'arranque', lambda: AppTest.from_file(here, default_timeout=600).run(), client.calls)
+    for page in at.sidebar.radio[0].options:
+        rep.step(size, 'app', f"{page} (1ª vez)", lambda: at.sidebar.radio[0].set_value(page).run(), client.calls)
+        rep.step(size, 'app', f"{page} (rerun)", lambda: at.run(), client.calls)
+        if at.exception: print(f"  ! {page}: {at.exception}", file=sys.stderr)
+
+
+def compare(current, baseline, tolerance=TOLERANCE):
+    keys = ['rows', 'section', 'step']
+    m = current.merge(baseline[keys + ['ms', 'api']], on=keys, how='left', suffixes=('', '_ref'))
+    m['Δ%'] = ((m['ms'] / m['ms_ref'] - 1) * 100).round(1)
+    slow = (m['ms'] > m['ms_ref'] * (1 + tolerance)) & (m['ms'] - m['ms_ref'] > 5)  # ignora ruido de pocos ms
+    more_api = m['api'].fillna(0) > m['api_ref'].fillna(0)
+    m['regresión'] = np.where(slow | more_api, '⚠', '')
+    return m
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark de Trading OS con datos sintéticos y gspread en memoria")
+    p.add_argument('--rows', default=",".join(map(str, SIZES)), help="filas del journal, separadas por comas (hasta 1000000)")
+    p.add_argument('--accounts', type=int, default=ACCOUNTS)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--app', action='store_true', help="incluir el render completo de cada página (AppTest)")
+    p.add_argument('--no-memory', action='store_true', help="sin tracemalloc (tiempos más limpios)")
+    p.add_argument('--json', help="guardar el informe")
+    p.add_argument('--compare', help="informe de referencia (JSON) para marcar regresiones")
+    args = p.parse_args(argv)
+
+    rep = Report(memory=not args.no_memory)
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in [int(s) for s in args.rows.split(',') if s.strip()]:
+            print(f"· {size:,} trades / {args.accounts} cuentas", file=sys.stderr)
+            frames = synth(size, args.accounts, args.seed)
+            bench_storage(rep, size, frames, workdir)
+            bench_pages(rep, size, frames)
+            if args.app: bench_app(rep, size, frames, workdir)
+    check_stale_reads(synth(20, args.accounts, args.seed))
+    check_editor_save(synth(20, args.accounts, args.seed))
+
+    out = rep.frame()
+    if args.compare:
+        with open(args.compare) as fh: out = compare(out, pd.DataFrame(json.load(fh)))
+    with pd.option_context('display.max_rows', None, 'display.width', 200, 'display.max_colwidth', 45):
+        print(out.to_string(index=False))
+    if args.json:
+        with open(args.json, 'w') as fh: json.dump(rep.rows, fh, indent=1)
+    return 1 if FAILED or (args.compare and (out['regresión'] == '⚠').any()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import Counter
+from schema import TABS, append_typed, conform
+
+# --- CACHÉ POR PESTAÑA ---
+# Cada pestaña tiene su propio TTL y una versión que sube con cada escritura,
+# así guardar 'subs' no obliga a volver a descargar el journal.
+# Con copia local (SnapshotStore) la caché nunca espera a la red si ya tiene
+# algo que enseñar: arranca desde el Parquet y lo caducado se reconcilia con el
+# remoto en un hilo aparte. Sin red se sigue trabajando con la copia local; sólo
+# se bloquea (o falla) cuando no hay nada local de esa pestaña.
+DEFAULT_TTL = 60
+TAB_TTL = {'journal': 60, 'accounts': 60, 'finance': 120, 'objectives': 60, 'subs': 300, 'groups': 300}
+OFFLINE_RETRY = 15  # segundos entre intentos de reconciliar mientras no hay red
+
+
+class TabCache:
+    def __init__(self, backend, ttl=None, snapshots=None):
+        self.backend = backend
+        self.snapshots = snapshots
+        self.ttl = dict(TAB_TTL, **(ttl or {}))
+        self.error = None  # último fallo del remoto (None = conectado)
+        self._entries = {}  # key -> (frame, cargado_en)
+        self._versions = {k: 0 for k in TABS}
+        self._dirty = set()  # pestañas con escrituras sin confirmar: no se recargan
+        self._forced = set()  # invalidadas a mano: se recargan sin pasar por la copia local
+        self._refreshing = set()
+        self.stats = Counter()  # hit / stale (servida y refrescando) / miss (carga bloqueante)
+        self._lock = threading.RLock()
+        # Cambios locales que no llegaron a subirse antes de cerrar
+        for k in (snapshots.dirty() if snapshots else []):
+            self._store(k, snapshots.load(k), 0.0)
+            self._dirty.add(k)
+
+    def _fresh(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and key in self._dirty: return True
+        return entry is not None and now - entry[1] < self.ttl.get(key, DEFAULT_TTL)
+
+    def get(self, keys):
+        return self.get_versioned(keys)[0]
+
+    def get_versioned(self, keys):
+        # Devuelve copias y la versión de cada una (leídas a la vez: el hilo de
+        # reconciliación puede subir versiones en mitad de un rerun). Las pestañas
+        # caducadas se piden juntas en una sola carga.
+        keys = list(keys)
+        with self._lock:
+            now = time.monotonic()
+            missing = [k for k in keys if k not in self._entries]
+            stale = [k for k in keys if k in self._entries and not self._fresh(k, now)]
+            warm = [k for k in missing if k not in self._forced and self._restore(k)]
+            cold = [k for k in missing if k not in warm]
+            if self.snapshots is None: cold, stale = cold + stale, []
+            self.stats.update(hit=len(keys) - len(cold) - len(stale) - len(warm), stale=len(stale) + len(warm), miss=len(cold))
+            if cold: self._load(cold, now)
+            self._forced.difference_update(keys)
+            out = {k: self._entries[k][0].copy() for k in keys}
+            versions = {k: self._versions[k] for k in keys}
+        if stale or warm: self._refresh_async(stale + warm)
+        return out, versions
+
+    def _restore(self, key):
+        if self.snapshots is None or not self.snapshots.has(key): return False
+        self._store(key, self.snapshots.load(key), 0.0)  # caducada: se reconcilia enseguida
+        return True
+
+    def _load(self, keys, now):
+        # Carga bloqueante; si el remoto falla se usa la copia local y, si no la hay,
+        # se propaga el error (un fallo de red nunca es una pestaña vacía)
+        try:
+            frames = self.backend.load_many(keys)
+            self.error = None
+        except Exception as e:
+            self.error = e
+            if not all(self._restore(k) for k in keys if k not in self._entries): raise
+            return
+        for k in keys:
+            self._store(k, frames[k], now)
+            self._persist(k, frames[k])
+
+    def _refresh_async(self, keys):
+        with self._lock:
+            keys = [k for k in dict.fromkeys(keys) if k not in self._refreshing and k not in self._dirty]
+            if not keys: return
+            self._refreshing.update(keys)
+            started = {k: self._versions[k] for k in keys}
+        threading.Thread(target=self._refresh, args=(keys, started), name="reconcile", daemon=True).start()
+
+    def _refresh(self, keys, started):
+        # started: versión de cada pestaña al pedirla; si cambió mientras tanto (un
+        # guardado, aunque ya esté confirmado) lo descargado es anterior y se descarta
+        try:
+            frames = self.backend.load_many(keys)
+            self.error = None
+        except Exception as e:
+            self.error = e
+            frames = {}
+        with self._lock:
+            now = time.monotonic()
+            changed = []
+            for k in keys:
+                self._refreshing.discard(k)
+                if k not in self._entries: continue
+                if k in self._dirty or self._versions[k] != started[k]: continue  # hay cambios locales más nuevos
+                if k not in frames:
+                    # Sin red: se reintenta en OFFLINE_RETRY en vez de a cada rerun
+                    self._entries[k] = (self._entries[k][0], now - self.ttl.get(k, DEFAULT_TTL) + OFFLINE_RETRY)
+                elif frames[k].equals(self._entries[k][0]):
+                    self._entries[k] = (self._entries[k][0], now)
+                else:
+                    self._store(k, frames[k], now); changed.append(k)
+        for k in changed: self._persist(k, frames[k])
+
+    def _persist(self, key, df, dirty=False):
+        if self.snapshots is None: return
+        try: self.snapshots.save(key, df, dirty)
+        except Exception: pass  # la copia local es una ayuda: un disco lleno no debe tumbar la app
+
+    def persist(self, key):
+        # Guarda en disco el estado actual (con cambios sin subir) antes de escribir en remoto
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None: self._persist(key, entry[0], dirty=True)
+
+    def pending(self):
+        # Pestañas recuperadas de disco con cambios locales que hay que volver a subir
+        with self._lock: return {k: self._entries[k][0].copy() for k in self._dirty if k in self._entries}
+
+    def put(self, key, df, dirty=False, rows=None):
+        # Tras una escritura: el marco guardado pasa a ser la versión en caché.
+        # dirty=True la protege de recargas hasta que el motor confirme (mark_clean).
+        # Con rows (un alta sobre lo que hay en caché) sólo se tipan las filas nuevas.
+        with self._lock:
+            base = self._entries.get(key)
+            if rows is not None and base is not None and len(base[0]) + len(rows) == len(df):
+                frame = append_typed(base[0], rows, key)
+            else:
+                frame = None
+        if frame is None: frame = conform(df, key)
+        with self._lock:
+            self._store(key, frame, time.monotonic())
+            if dirty: self._dirty.add(key)
+
+    def mark_clean(self, key):
+        with self._lock:
+            self._dirty.discard(key)
+            if key in self._entries: self._entries[key] = (self._entries[key][0], time.monotonic())
+        if self.snapshots is not None: self.snapshots.mark(key, dirty=False)
+
+    def _store(self, key, frame, now):
+        self._entries[key] = (frame, now)
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def version(self, key):
+        return self._versions.get(key, 0)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            for k in ([key] if key else list(self._entries)):
+                if k not in self._dirty:
+                    self._entries.pop(k, None)
+                    self._forced.add(k)
@@ -0,0 +1,64 @@
+import calendar
+import html
+from datetime import date
+
+# --- CALENDARIO (HTML EN UNA SOLA LLAMADA) ---
+# Los eventos se indexan por fecha una vez y el mes entero se pinta como una
+# rejilla CSS en un único st.markdown, en vez de 7 columnas x semanas.
+DAYS_LONG = ['LUN', 'MAR', 'MIE', 'JUE', 'VIE', 'SAB', 'DOM']
+DAYS_SHORT = ['L', 'M', 'X', 'J', 'V', 'S', 'D']
+MONTHS = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+
+def tasks_by_date(objectives):
+    # {date: [(tarea, hecha)]}
+    out = {}
+    o = objectives.dropna(subset=['Fecha_Limite'])
+    for f, t, e in zip(o['Fecha_Limite'].dt.date, o['Tarea'], o['Estado']):
+        out.setdefault(f, []).append((t, e == 'Hecho'))
+    return out
+
+
+def renewals_by_day(subs):
+    # {día del mes: [servicio]}
+    out = {}
+    for d, s in zip(subs['Dia_Renovacion'], subs['Servicio']):
+        out.setdefault(int(d), []).append(s)
+    return out
+
+
+def agenda_cell(tasks, renewals):
+    def cell(d):
+        evts = "".join(f"<span class='event-tag {'evt-done' if done else 'evt-task'}'>{html.escape(str(t))}</span>" for t, done in tasks.get(d, []))
+        evts += "".join(f"<span class='event-tag evt-bill'>💸 {html.escape(str(s))}</span>" for s in renewals.get(d.day, []))
+        return "calendar-day-agenda", evts
+    return cell
+
+
+def pnl_cell(day_pnl):
+    def cell(d):
+        pnl = day_pnl(d)
+        cls = "win-day" if pnl > 0 else "loss-day" if pnl < 0 else ""
+        txt = f"<span class='{'win-text' if pnl > 0 else 'loss-text'}'>${pnl:,.0f}</span>" if pnl != 0 else "-"
+        return f"pnl-cell {cls}", f"<div class='cell-pnl'>{txt}</div>"
+    return cell
+
+
+def month_html(year, month, cell, headers=DAYS_LONG, compact=False):
+    parts = [f"<div class='cal-grid{' compact' if compact else ''}'>"]
+    parts += [f"<div class='cal-header'>{h}</div>" for h in headers]
+    for week in calendar.monthcalendar(year, month):
+        for d in week:
+            if d == 0:
+                parts.append("<div class='cal-empty'></div>")
+                continue
+            cls, inner = cell(date(year, month, d))
+            parts.append(f"<div class='{cls}'><div class='cell-date'>{d}</div>{inner}</div>")
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def year_html(year, cell, headers=DAYS_SHORT, per_row=3):
+    # Vista anual: los 12 meses compactos en una sola rejilla
+    months = "".join(f"<div class='cal-month'><div class='cal-month-title'>{MONTHS[m - 1]}</div>{month_html(year, m, cell, headers, compact=True)}</div>" for m in range(1, 13))
+    return f"<div class='cal-year' style='grid-template-columns: repeat({per_row}, minmax(0, 1fr))'>{months}</div>"
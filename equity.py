@@ -0,0 +1,81 @@
+import threading
+import numpy as np
+import pandas as pd
+from analytics import _scopes
+
+# --- CURVAS DE EQUITY ---
+# PnL acumulado trade a trade por serie (cartera, cuenta, estrategia y grupo),
+# calculado una vez por versión del journal. Al gráfico sólo llega una versión
+# reducida (LTTB o min/max por cubos) del rango visible, con un máximo de puntos
+# por serie; cada serie reducida se memoriza, así superponer otra cuenta sólo
+# calcula esa.
+MAX_POINTS = 1500
+PORTFOLIO = 'Total|Cartera'
+
+
+def lttb(x, y, n):
+    # Largest-Triangle-Three-Buckets: índices de los n puntos que conservan la forma
+    size = len(y)
+    if n >= size or n < 3: return np.arange(size)
+    edges = np.linspace(1, size - 1, n - 1).astype(int)
+    out = np.empty(n, dtype=int); out[0], out[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = slice(hi, edges[i + 2]) if i + 2 < len(edges) else slice(size - 1, size)
+        cx, cy = x[nxt].mean(), y[nxt].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def minmax(y, n):
+    # Mínimo y máximo de cada cubo (n/2 cubos), en su orden original
+    size = len(y)
+    if n >= size or n < 4: return np.arange(size)
+    starts = np.linspace(0, size, n // 2, endpoint=False).astype(int)
+    lo = np.minimum.reduceat(y, starts); hi = np.maximum.reduceat(y, starts)
+    bucket = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, size)))
+    pos = np.arange(size)
+    first_min = pd.Series(np.where(y == lo[bucket], pos, size)).groupby(bucket).min().to_numpy()
+    first_max = pd.Series(np.where(y == hi[bucket], pos, size)).groupby(bucket).min().to_numpy()
+    return np.unique(np.concatenate([[0, size - 1], first_min, first_max]))
+
+
+class EquityCurves:
+    def __init__(self, journal, groups=None):
+        rows = _scopes(journal, groups) if not journal.empty else pd.DataFrame(columns=['scope', 'Fecha', 'PnL'])
+        rows['eq'] = rows.groupby('scope')['PnL'].cumsum()
+        self.series = {s: (g['Fecha'].to_numpy(), g['eq'].to_numpy(dtype=float)) for s, g in rows.groupby('scope', sort=False)}
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def names(self, ambito=None):
+        return [s for s in self.series if ambito is None or s.startswith(f"{ambito}|")]
+
+    def span(self):
+        if PORTFOLIO not in self.series: return None, None
+        x = self.series[PORTFOLIO][0]
+        return pd.Timestamp(x[0]), pd.Timestamp(x[-1])
+
+    def curve(self, name, start=None, end=None, points=MAX_POINTS, method='lttb'):
+        # Serie reducida en [start, end] -> DataFrame(Fecha, Equity)
+        key = (name, start, end, points, method)
+        with self._lock:
+            if key in self._memo: return self._memo[key]
+        x, y = self.series.get(name, (np.array([], dtype='datetime64[ns]'), np.array([])))
+        lo = np.searchsorted(x, np.datetime64(start), 'left') if start is not None else 0
+        hi = np.searchsorted(x, np.datetime64(end), 'right') if end is not None else len(x)
+        x, y = x[lo:hi], y[lo:hi]
+        idx = lttb(np.arange(len(y), dtype=float), y, points) if method == 'lttb' else minmax(y, points)
+        out = pd.DataFrame({'Fecha': x[idx], 'Equity': y[idx]})
+        with self._lock:
+            if len(self._memo) > 256: self._memo.clear()
+            self._memo[key] = out
+        return out
+
+    def overlay(self, names, start=None, end=None, points=MAX_POINTS, method='lttb'):
+        # Varias series en formato largo (Serie, Fecha, Equity) para un gráfico por color
+        parts = [self.curve(n, start, end, points, method).assign(Serie=n.split('|', 1)[1]) for n in names]
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=['Fecha', 'Equity', 'Serie'])
@@ -0,0 +1,31 @@
+import pandas as pd
+from datetime import date
+
+# --- GASTOS RECURRENTES ---
+SUB_EXPENSE_TYPE = 'GASTO (Suscripción)'
+
+
+def pending_expenses(subs, finance, start, end=None, today=None):
+    # Gastos de suscripción que faltan entre los meses de start y end (incluidos).
+    # Anti-join (mes, servicio) contra lo ya registrado en finanzas: sin bucles por fila.
+    # El mes en curso se apunta con fecha de hoy; los meses pasados, en su día de renovación.
+    today = pd.Timestamp(today or date.today()).normalize()
+    end = min(pd.Timestamp(end or today), today)
+    cols = ['Fecha', 'Tipo', 'Concepto', 'Monto']
+    periods = pd.period_range(pd.Timestamp(start).to_period('M'), end.to_period('M'), freq='M')
+    if subs.empty or len(periods) == 0: return pd.DataFrame(columns=cols)
+
+    grid = subs[['Servicio', 'Monto', 'Dia_Renovacion']].drop_duplicates('Servicio')
+    grid = grid.assign(Servicio=grid['Servicio'].astype(str)).merge(pd.DataFrame({'Periodo': periods}), how='cross')
+    have = pd.DataFrame({'Periodo': pd.to_datetime(finance['Fecha'], errors='coerce').dt.to_period('M'),
+                         'Servicio': finance['Concepto'].astype(str)}).dropna().drop_duplicates()
+    grid = grid.merge(have, on=['Periodo', 'Servicio'], how='left', indicator=True)
+    grid = grid[grid['_merge'] == 'left_only']
+    if grid.empty: return pd.DataFrame(columns=cols)
+
+    day = pd.to_numeric(grid['Dia_Renovacion'], errors='coerce').fillna(1).clip(lower=1, upper=grid['Periodo'].dt.days_in_month)
+    fecha = grid['Periodo'].dt.start_time + pd.to_timedelta(day - 1, unit='D')
+    fecha = fecha.where(grid['Periodo'] != today.to_period('M'), today)
+    out = pd.DataFrame({'Fecha': fecha, 'Tipo': SUB_EXPENSE_TYPE, 'Concepto': grid['Servicio'],
+                        'Monto': -pd.to_numeric(grid['Monto'], errors='coerce').fillna(0.0).abs()})
+    return out.sort_values(['Fecha', 'Concepto']).reset_index(drop=True)
@@ -0,0 +1,58 @@
+import math
+import pandas as pd
+from schema import editable
+
+# --- TABLAS PAGINADAS ---
+# El editor sólo recibe la página visible; los cambios vuelven por posición
+# dentro de esa página y se traducen a la etiqueta de fila del marco completo.
+
+
+def filter_frame(df, date_col, start=None, end=None, filters=None):
+    mask = pd.Series(True, index=df.index)
+    if start is not None: mask &= df[date_col] >= pd.Timestamp(start)
+    if end is not None: mask &= df[date_col] < pd.Timestamp(end) + pd.Timedelta(days=1)
+    for col, vals in (filters or {}).items():
+        if vals: mask &= df[col].astype(str).isin([str(v) for v in vals])
+    return df[mask]
+
+
+def page_count(n, size):
+    return max(1, math.ceil(n / size))
+
+
+def page_of(df, page, size, sort_col, ascending=False):
+    # Ordena sólo lo filtrado y corta la página (conserva las etiquetas originales).
+    # Las filas sin valor van primero: así se ven y se pueden corregir o borrar.
+    page = min(max(page, 1), page_count(len(df), size))
+    ordered = df.sort_values(sort_col, ascending=ascending, kind='stable', na_position='first')
+    return ordered.iloc[(page - 1) * size: page * size]
+
+
+def _cast(series, v):
+    if pd.api.types.is_datetime64_any_dtype(series): return pd.to_datetime(v, errors='coerce')
+    if pd.api.types.is_numeric_dtype(series):
+        v = pd.to_numeric(v, errors='coerce')
+        return 0 if pd.isna(v) else v
+    return '' if v is None else v
+
+
+def apply_edits(full, view, changes):
+    # changes = estado del data_editor: edited_rows / added_rows / deleted_rows.
+    # Devuelve el marco completo en su orden original, o None si no hay cambios.
+    edited = changes.get('edited_rows', {}) if changes else {}
+    added = changes.get('added_rows', []) if changes else []
+    deleted = changes.get('deleted_rows', []) if changes else []
+    if not (edited or added or deleted): return None
+
+    out = editable(full).copy()
+    labels = view.index
+    for pos, cols in edited.items():
+        label = labels[int(pos)]
+        for col, v in cols.items():
+            if col in out.columns: out.at[label, col] = _cast(out[col], v)
+    if deleted:
+        out = out.drop(index=[labels[int(p)] for p in deleted])
+    if added:
+        new = pd.DataFrame([{c: _cast(out[c], r.get(c)) for c in out.columns} for r in added])
+        out = pd.concat([out, new], ignore_index=True)
+    return out
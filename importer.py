@@ -0,0 +1,156 @@
+import re
+import numpy as np
+import pandas as pd
+
+# --- IMPORTACIÓN DE EJECUCIONES (CSV DEL BROKER) ---
+# Lee exportaciones de fills (NinjaTrader, Tradovate...) por bloques, empareja
+# las ejecuciones en trades ida-y-vuelta (de plano a plano) y devuelve filas
+# del Journal. Sólo se arrastran entre bloques los fills de posiciones abiertas,
+# así la memoria no depende del tamaño del fichero. Se asume el CSV en orden
+# cronológico (como lo exportan ambas plataformas).
+CHUNK = 50_000
+# Columnas del Journal que identifican un trade ya importado (Notas/Estrategia se editan)
+DEDUP_COLS = ['Fecha', 'Cuenta', 'Activo', 'PnL']
+
+# Nombre de columna en cada plataforma -> campo normalizado
+ALIASES = {
+    'time': ['Time', 'Timestamp', 'Fill Time', 'Date/Time', 'DateTime', '_timestamp'],
+    'account': ['Account', 'Account Name', 'Cuenta'],
+    'instrument': ['Instrument', 'Contract', 'Symbol', 'Product'],
+    'side': ['Action', 'B/S', 'Side', 'Buy/Sell'],
+    'qty': ['Quantity', 'Qty', 'Filled Qty', 'filledQty', '_qty'],
+    'price': ['Price', 'Fill Price', 'Avg Price', 'avgPrice', '_price'],
+    'commission': ['Commission', 'Commissions', 'Fees', 'Fee'],
+}
+# Valor del punto por raíz de contrato (USD)
+POINT_VALUE = {'NQ': 20, 'MNQ': 2, 'ES': 50, 'MES': 5, 'YM': 5, 'MYM': 0.5, 'RTY': 50, 'M2K': 5,
+               'CL': 1000, 'MCL': 100, 'GC': 100, 'MGC': 10, 'SI': 5000, '6E': 125000}
+_ROOTS = sorted(POINT_VALUE, key=len, reverse=True)
+_MONTH_CODE = re.compile(r'[FGHJKMNQUVXZ]\d{1,4}$')
+
+
+def instrument_root(name):
+    # "NQ 12-25" / "NQZ5" / "MNQZ2025" -> "NQ" / "NQ" / "MNQ"
+    s = str(name).strip().upper().split(' ')[0]
+    for root in _ROOTS:
+        if s.startswith(root) and (len(s) == len(root) or _MONTH_CODE.match(s[len(root):])): return root
+    return s
+
+
+def _pick(cols, field):
+    for alias in ALIASES[field]:
+        if alias in cols: return alias
+    low = {c.lower(): c for c in cols}
+    for alias in ALIASES[field]:
+        if alias.lower() in low: return low[alias.lower()]
+    return None
+
+
+def _num(s):
+    return pd.to_numeric(s.astype(str).str.replace(r'[^0-9.\-]', '', regex=True), errors='coerce')
+
+
+def normalize_fills(raw, account=None):
+    # Columnas de la plataforma -> time, account, instrument, sq (cantidad con signo), price, commission
+    cols = {f: _pick(raw.columns, f) for f in ALIASES}
+    missing = [f for f in ('time', 'instrument', 'side', 'qty', 'price') if cols[f] is None]
+    if missing: raise ValueError(f"Faltan columnas en el CSV: {', '.join(missing)}")
+    side = raw[cols['side']].astype(str).str.strip().str.upper().str[0].map({'B': 1, 'S': -1})
+    out = pd.DataFrame({
+        'time': pd.to_datetime(raw[cols['time']], errors='coerce', format='mixed'),
+        'account': account if account else (raw[cols['account']].astype(str).str.strip() if cols['account'] else 'General'),
+        'instrument': raw[cols['instrument']].astype(str).str.strip(),
+        'sq': side * _num(raw[cols['qty']]).abs(),
+        'price': _num(raw[cols['price']]),
+        'commission': _num(raw[cols['commission']]).abs().fillna(0.0) if cols['commission'] else 0.0,
+    })
+    return out.dropna(subset=['time', 'sq', 'price'])
+
+
+def _split_flips(f):
+    # Un fill que cruza de largo a corto (o al revés) se parte en cierre + apertura
+    keys = ['account', 'instrument']
+    after = f.groupby(keys, sort=False)['sq'].cumsum()
+    before = after - f['sq']
+    flip = (before != 0) & (after != 0) & (np.sign(before) != np.sign(after))
+    if not flip.any(): return f
+    close = f[flip].copy(); opening = f[flip].copy()
+    close['sq'] = -before[flip]; opening['sq'] = after[flip]
+    share = (close['sq'].abs() / f.loc[flip, 'sq'].abs())
+    close['commission'] = f.loc[flip, 'commission'] * share
+    opening['commission'] = f.loc[flip, 'commission'] * (1 - share)
+    close['sub'] = 0; opening['sub'] = 1
+    f = pd.concat([f[~flip].assign(sub=0), close, opening])
+    return f.sort_values(keys + ['seq', 'sub'], kind='stable').drop(columns='sub')
+
+
+def pair_fills(fills):
+    # -> (trades cerrados, fills de posiciones aún abiertas para el siguiente bloque)
+    keys = ['account', 'instrument']
+    f = fills.sort_values(keys + ['seq'], kind='stable')
+    f = _split_flips(f)
+    after = f.groupby(keys, sort=False)['sq'].cumsum()
+    opens = (after - f['sq']) == 0
+    f = f.assign(tid=opens.groupby([f['account'], f['instrument']], sort=False).cumsum(), pos=after,
+                 cash=-f['sq'] * f['price'], vol=f['sq'].abs())
+    g = f.groupby(keys + ['tid'], sort=False)
+    trades = g.agg(entry=('time', 'first'), exit=('time', 'last'), qty=('vol', 'sum'),
+                   cash=('cash', 'sum'), commission=('commission', 'sum'), pos=('pos', 'last')).reset_index()
+    trades['qty'] = trades['qty'] / 2  # volumen de entrada = volumen de salida
+    done = trades['pos'] == 0
+    open_keys = trades.loc[~done, keys + ['tid']]
+    carry = f.merge(open_keys, on=keys + ['tid'])[fills.columns]
+    return trades[done].drop(columns=['pos', 'tid']), carry
+
+
+def read_fills(source, account=None, chunksize=CHUNK):
+    # Bloques normalizados con un contador global para conservar el orden del fichero
+    seq = 0
+    for raw in pd.read_csv(source, chunksize=chunksize, dtype=str, skipinitialspace=True):
+        raw.columns = [c.strip() for c in raw.columns]
+        f = normalize_fills(raw, account)
+        f['seq'] = np.arange(seq, seq + len(f)); seq += len(f)
+        yield f
+
+
+def fills_to_trades(source, account=None, chunksize=CHUNK):
+    parts, carry = [], None
+    for chunk in read_fills(source, account, chunksize):
+        if carry is not None and not carry.empty: chunk = pd.concat([carry, chunk], ignore_index=True)
+        trades, carry = pair_fills(chunk)
+        parts.append(trades)
+    if not parts: return pd.DataFrame(columns=['account', 'instrument', 'entry', 'exit', 'qty', 'cash', 'commission'])
+    return pd.concat(parts, ignore_index=True)
+
+
+def trades_to_journal(trades, strategy='OTRO', risk=None, point_value=None):
+    pv = dict(POINT_VALUE, **(point_value or {}))
+    root = trades['instrument'].map({u: instrument_root(u) for u in trades['instrument'].unique()})
+    pnl = (trades['cash'] * root.map(pv).fillna(1.0) - trades['commission']).round(2)
+    # Sin stop en los fills: RR = PnL / riesgo indicado, o / pérdida media del lote importado
+    unit = risk if risk else (pnl[pnl < 0].abs().mean() if (pnl < 0).any() else np.nan)
+    rr = (pnl / unit).round(2).fillna(0.0) if unit and unit == unit else pd.Series(0.0, index=pnl.index)
+    return pd.DataFrame({
+        'Fecha': trades['exit'].dt.normalize(), 'Cuenta': trades['account'], 'Activo': root, 'Estrategia': strategy,
+        'Resultado': np.where(pnl > 0, 'WIN', np.where(pnl < 0, 'LOSS', 'BE')), 'RR': rr, 'PnL': pnl,
+        'Emociones': '', 'Screenshot': '', 'Notas': '',
+    })
+
+
+def trade_keys(df):
+    # Huella de cada fila del Journal a partir de su contenido (DEDUP_COLS)
+    key = pd.DataFrame({'f': pd.to_datetime(df['Fecha'], errors='coerce').dt.normalize(), 'c': df['Cuenta'].astype(str),
+                        'a': df['Activo'].astype(str), 'p': pd.to_numeric(df['PnL'], errors='coerce').round(2)})
+    return pd.Series(pd.util.hash_pandas_object(key, index=False).to_numpy(), index=df.index)
+
+
+def import_fills(source, journal=None, account=None, strategy='OTRO', risk=None, chunksize=CHUNK):
+    # Filas nuevas para el Journal, sin las ya importadas antes. Se cuenta cuántas filas
+    # con la misma huella hay ya en el Journal y sólo entran las que sobran: dos trades
+    # idénticos del mismo fichero siguen siendo dos.
+    rows = trades_to_journal(fills_to_trades(source, account, chunksize), strategy, risk)
+    if journal is not None and not journal.empty and not rows.empty:
+        keys = trade_keys(rows)
+        have = keys.map(trade_keys(journal).value_counts()).fillna(0)
+        rows = rows[(keys.groupby(keys).cumcount() >= have).to_numpy()]
+    return rows.sort_values('Fecha', kind='stable').reset_index(drop=True)
@@ -0,0 +1,33 @@
+import pandas as pd
+
+# --- GRUPOS Y REPARTO DE TRADES ---
+# 'Cuentas' en la pestaña Grupos: "Apex 01:2,Apex 02,Apex 03:0.5"
+# (cuenta[:multiplicador de contratos]; sin multiplicador vale 1).
+
+
+def parse_members(text):
+    names, mults = [], []
+    for part in str(text or '').split(','):
+        name, _, mult = part.strip().partition(':')
+        if not name.strip(): continue
+        names.append(name.strip())
+        mults.append(pd.to_numeric(mult.strip() or 1, errors='coerce'))
+    return pd.DataFrame({'Cuenta': names, 'Mult': pd.Series(mults, dtype='float64').fillna(1.0)})
+
+
+def format_members(members):
+    return ",".join(c if m == 1 else f"{c}:{m:g}" for c, m in zip(members['Cuenta'], members['Mult']))
+
+
+def resolve_groups(groups):
+    # {grupo: DataFrame(Cuenta, Mult)}, resuelto una vez por versión de la pestaña
+    return {str(g): parse_members(c) for g, c in zip(groups['Nombre_Grupo'], groups['Cuentas'])}
+
+
+def fan_out(trade, members):
+    # Una fila por cuenta; el PnL se escala con el multiplicador de cada una
+    rows = pd.DataFrame({'Cuenta': members['Cuenta'].to_numpy()})
+    for col, v in trade.items():
+        if col != 'Cuenta': rows[col] = [v] * len(rows)
+    rows['PnL'] = float(trade.get('PnL', 0.0)) * members['Mult'].to_numpy()
+    return rows
@@ -0,0 +1,94 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from analytics import WIN_DAY_THRESHOLD
+
+# --- SIMULADOR MONTE CARLO (PROP FIRMS) ---
+# Remuestrea los trades históricos (de la cuenta, de una estrategia o de toda la
+# cartera) para simular muchos caminos hacia el objetivo: balance objetivo + días
+# winning (PnL diario >= umbral), con límite de drawdown opcional. Cada día se
+# simula para todos los caminos a la vez; las cuentas se reparten en procesos.
+PATHS = 20_000
+HORIZON = 60  # días operados
+MIN_TRADES = 5
+
+
+def simulate_account(job):
+    # job: dict con pnl (trades), per_day (trades por cuenta y día observados), balance, target,
+    # win_days, days_target, threshold, dd_limit, trailing, paths, horizon, seed
+    pnl = np.asarray(job['pnl'], dtype=float)
+    per_day = np.asarray(job['per_day'], dtype=int)
+    out = {'Cuenta': job['name'], 'Muestra': len(pnl)}
+    if len(pnl) < MIN_TRADES or len(per_day) == 0:
+        return dict(out, Pasa=np.nan, Quema=np.nan, Dias_Media=np.nan, Dias_Mediana=np.nan)
+
+    rng = np.random.default_rng(job['seed'])
+    n, kmax = job['paths'], int(per_day.max())
+    bal = np.full(n, float(job['balance']))
+    peak = bal.copy()
+    floor0 = bal - job['dd_limit'] if job['dd_limit'] else None
+    wd = np.full(n, int(job['win_days']))
+    alive = np.ones(n, dtype=bool)
+    passed_on = np.full(n, -1)
+    failed = np.zeros(n, dtype=bool)
+    done = (bal >= job['target']) & (wd >= job['days_target'])
+    passed_on[done] = 0; alive &= ~done
+
+    for day in range(1, job['horizon'] + 1):
+        if not alive.any(): break
+        k = rng.choice(per_day, n)
+        draws = rng.choice(pnl, (n, kmax))
+        day_pnl = np.where(np.arange(kmax) < k[:, None], draws, 0.0).sum(axis=1)
+        day_pnl[~alive] = 0.0
+        bal += day_pnl
+        wd += (day_pnl >= job['threshold']) & alive
+        if job['dd_limit']:
+            peak = np.maximum(peak, bal)
+            floor = peak - job['dd_limit'] if job['trailing'] else floor0
+            burnt = alive & (bal <= floor)
+            failed |= burnt; alive &= ~burnt
+        ok = alive & (bal >= job['target']) & (wd >= job['days_target'])
+        passed_on[ok] = day; alive &= ~ok
+
+    days = passed_on[passed_on >= 0]
+    return dict(out, Pasa=(passed_on >= 0).mean(), Quema=failed.mean(),
+                Dias_Media=days.mean() if len(days) else np.nan, Dias_Mediana=np.median(days) if len(days) else np.nan)
+
+
+def build_jobs(accounts, journal, source='Cuenta', win_days=None, threshold=WIN_DAY_THRESHOLD, dd_limit=0.0, trailing=True,
+               paths=PATHS, horizon=HORIZON, seed=0):
+    # source: 'Cuenta' (trades de cada cuenta), 'Cartera' (todos) o el nombre de una estrategia
+    j = journal.assign(Cuenta=journal['Cuenta'].astype(str), Estrategia=journal['Estrategia'].astype(str))
+    pools = {}
+    if source == 'Cuenta':
+        pools = {c: g for c, g in j.groupby('Cuenta')}
+    else:
+        shared = j if source == 'Cartera' else j[j['Estrategia'] == source]
+    seeds = np.random.SeedSequence(seed).spawn(len(accounts))
+    jobs = []
+    for (_, r), ss in zip(accounts.iterrows(), seeds):
+        sample = pools.get(str(r['Nombre']), j.iloc[:0]) if source == 'Cuenta' else shared
+        jobs.append({
+            'name': r['Nombre'], 'pnl': sample['PnL'].to_numpy(dtype=float),
+            # Trades por día de una cuenta: con muestra compartida (cartera o estrategia) se
+            # cuenta por cuenta-día, si no las copias de un grupo se sumarían en cada día simulado
+            'per_day': sample.groupby(['Fecha', 'Cuenta']).size().to_numpy(),
+            'balance': float(r['Balance_Actual']), 'target': float(r['Balance_Objetivo']),
+            'win_days': int((win_days or {}).get(r['Nombre'], 0)), 'days_target': int(r['Dias_Objetivo']),
+            'threshold': threshold, 'dd_limit': float(dd_limit or 0.0), 'trailing': trailing,
+            'paths': int(paths), 'horizon': int(horizon), 'seed': ss,
+        })
+    return jobs
+
+
+def run(jobs, pool=None):
+    if pool is None or len(jobs) < 2: results = [simulate_account(j) for j in jobs]
+    else: results = list(pool.map(simulate_account, jobs))
+    return pd.DataFrame(results, columns=['Cuenta', 'Muestra', 'Pasa', 'Quema', 'Dias_Media', 'Dias_Mediana'])
+
+
+def make_pool(workers=None):
+    # spawn: no hereda los hilos del servidor de Streamlit
+    return ProcessPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1), mp_context=multiprocessing.get_context('spawn'))
@@ -0,0 +1,113 @@
+import contextvars
+import json
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import pandas as pd
+
+# --- INSTRUMENTACIÓN ---
+# Eventos con tiempo de pared por rerun: conexión, cargas (aciertos/fallos de
+# caché), guardados, render de cada página y cada petición HTTP a Google (bytes,
+# estado y si gasta cuota de Sheets). Se guardan en memoria (últimos MAX_EVENTS)
+# y, si se indica log_path, también como JSONL (una línea por evento).
+# El rerun va en un ContextVar que fija begin_run en el hilo de la sesión: cada
+# sesión ve sólo lo suyo y los hilos de escritura/reconciliación (que arrancan
+# con contexto vacío) quedan con run=None y origen 'segundo plano'.
+QUOTA_PER_MIN = 60  # peticiones por minuto y usuario (lecturas y escrituras por separado)
+MAX_EVENTS = 5000
+
+
+def _api_name(method, endpoint):
+    # URL -> nombre estable: sin ID de hoja ni rangos ("GET sheets values:batchGet")
+    host = 'sheets' if 'sheets.googleapis' in endpoint else 'drive' if 'googleapis' in endpoint else 'http'
+    path = re.sub(r'^https?://[^/]+', '', endpoint.split('?')[0])
+    path = re.sub(r'/spreadsheets/[^/:]+', '', path)
+    path = re.sub(r'/values/[^/:]+', '/values/{rango}', path)
+    path = re.sub(r'/files/[^/]+', '/files/{id}', path)
+    return f"{method} {host} {path.strip('/') or '/'}"
+
+
+class Recorder:
+    def __init__(self, log_path=None, quota=QUOTA_PER_MIN):
+        self.log_path = log_path
+        self.quota = quota
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.runs = 0
+        self._run = contextvars.ContextVar('perf_run', default=None)
+        self._lock = threading.Lock()
+
+    def begin_run(self):
+        with self._lock:
+            self.runs += 1
+            run = self.runs
+        self._run.set(run)
+        return run
+
+    def record(self, kind, name, ms, **extra):
+        run = self._run.get()
+        ev = {'ts': round(time.time(), 3), 'run': run, 'origin': 'rerun' if run is not None else 'segundo plano',
+              'thread': threading.current_thread().name, 'kind': kind, 'name': name, 'ms': round(ms, 2), **extra}
+        with self._lock:
+            self.events.append(ev)
+            if self.log_path:
+                with open(self.log_path, 'a') as f: f.write(json.dumps(ev, default=str) + '\n')
+        return ev
+
+    @contextmanager
+    def timed(self, kind, name, **extra):
+        # Lo que se añada al dict devuelto (hits, filas...) acaba en el evento
+        box = dict(extra)
+        t0 = time.perf_counter()
+        try: yield box
+        finally: self.record(kind, name, (time.perf_counter() - t0) * 1000, **box)
+
+    def instrument(self, client):
+        # Envuelve la sesión HTTP de gspread: cada petición real (reintentos incluidos)
+        # queda registrada, también las de los hilos de escritura y reconciliación
+        session = client.http_client.session
+        inner = session.request
+
+        def request(method, url, *args, **kwargs):
+            t0 = time.perf_counter()
+            status, size = 'error', 0
+            try:
+                resp = inner(method, url, *args, **kwargs)
+                status, size = resp.status_code, len(resp.content or b'')
+                return resp
+            finally:
+                body = kwargs.get('json') if kwargs.get('json') is not None else kwargs.get('data')
+                sent = len(json.dumps(body)) if isinstance(body, (dict, list)) else len(body or b'')
+                self.record('api', _api_name(method, url), (time.perf_counter() - t0) * 1000, status=status,
+                            bytes_in=size, bytes_out=sent, sheets='sheets.googleapis' in url, write=method != 'GET')
+
+        session.request = request
+        return client
+
+    def frame(self, run=None):
+        with self._lock: evs = list(self.events)
+        df = pd.DataFrame(evs)
+        if df.empty or run is None: return df
+        return df[df['run'] == run]
+
+    def summary(self, run):
+        # Una fila por (tipo, nombre) del rerun: veces, ms, bytes y caché
+        df = self.frame(run)
+        if df.empty: return df
+        for c in ['bytes_in', 'bytes_out', 'hits', 'misses']:
+            if c not in df: df[c] = 0
+        out = df.groupby(['kind', 'name'], sort=False).agg(n=('ms', 'size'), ms=('ms', 'sum'), bytes_in=('bytes_in', 'sum'),
+                                                            bytes_out=('bytes_out', 'sum'), hits=('hits', 'sum'), misses=('misses', 'sum'))
+        return out.reset_index().sort_values('ms', ascending=False)
+
+    def quota_window(self, seconds=60):
+        # Peticiones a Sheets en la última ventana: (lecturas, escrituras)
+        now = time.time()
+        with self._lock:
+            recent = [e for e in self.events if e['kind'] == 'api' and e.get('sheets') and now - e['ts'] <= seconds]
+        writes = sum(1 for e in recent if e['write'])
+        return len(recent) - writes, writes
+
+    def export(self):
+        with self._lock: return "".join(json.dumps(e, default=str) + '\n' for e in self.events)
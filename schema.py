@@ -0,0 +1,101 @@
+import pandas as pd
+
+# --- ESQUEMA ---
+TABS = {'journal': 'Journal', 'accounts': 'Cuentas', 'finance': 'Finanzas', 'objectives': 'Objetivos', 'subs': 'Suscripciones', 'groups': 'Grupos'}
+COLS = {
+    'journal': ['Fecha', 'Cuenta', 'Activo', 'Estrategia', 'Resultado', 'RR', 'PnL', 'Emociones', 'Screenshot', 'Notas'],
+    'accounts': ['Nombre', 'Empresa', 'Tipo', 'Balance_Inicial', 'Balance_Actual', 'Balance_Objetivo', 'Dias_Objetivo', 'Costo', 'Estado', 'Fecha_Creacion', 'Manual_WD', 'DD_Max', 'Limite_Diario'],
+    'finance': ['Fecha', 'Tipo', 'Concepto', 'Monto'],
+    'objectives': ['ID', 'Tarea', 'Tipo', 'Fecha_Limite', 'Estado', 'Target_Dinero'],
+    'subs': ['Servicio', 'Monto', 'Dia_Renovacion'],
+    'groups': ['Nombre_Grupo', 'Cuentas']
+}
+
+# Tipos en memoria por pestaña (lo que no aparece se queda como texto).
+# Fechas se parsean una vez; dinero en float64 (float32 pierde céntimos al sumar);
+# categorías sólo en journal/finanzas, que nunca se editan con .at sobre esas columnas.
+TYPES = {
+    'journal': {'Fecha': 'date', 'Cuenta': 'category', 'Activo': 'category', 'Estrategia': 'category', 'Resultado': 'category', 'RR': 'float32', 'PnL': 'float64'},
+    'accounts': {'Balance_Inicial': 'float64', 'Balance_Actual': 'float64', 'Balance_Objetivo': 'float64', 'Dias_Objetivo': 'int32', 'Costo': 'float64', 'Fecha_Creacion': 'date', 'Manual_WD': 'int32', 'DD_Max': 'float64', 'Limite_Diario': 'float64'},
+    'finance': {'Fecha': 'date', 'Tipo': 'category', 'Monto': 'float64'},
+    'objectives': {'ID': 'int32', 'Fecha_Limite': 'date', 'Target_Dinero': 'float64'},
+    'subs': {'Monto': 'float64', 'Dia_Renovacion': 'int32'},
+    'groups': {},
+}
+NUMERIC = ('float32', 'float64', 'int32')
+NUM_COLS = sorted({c for t in TYPES.values() for c, k in t.items() if k in NUMERIC})
+DATE_COLS = sorted({c for t in TYPES.values() for c, k in t.items() if k == 'date'})
+DATE_FMT = '%Y-%m-%d'
+
+
+def empty_frame(key):
+    return to_typed(pd.DataFrame(columns=COLS[key]), key)
+
+
+def to_typed(df, key):
+    # Texto de la hoja/BD -> tipos compactos (una sola vez, al cargar).
+    # Las columnas nuevas del esquema que aún no existen en la hoja se crean vacías.
+    missing = [c for c in COLS[key] if c not in df.columns]
+    if missing: df = df.assign(**{c: '' for c in missing})
+    for col, kind in TYPES[key].items():
+        if col in df.columns: df[col] = _typed(df[col], kind)
+    return df
+
+
+def _typed(s, kind):
+    if kind == 'date': return pd.to_datetime(s, errors='coerce', format='mixed')
+    if kind == 'category': return s.fillna('').astype(str).astype('category')
+    return pd.to_numeric(s, errors='coerce').fillna(0).astype(kind)
+
+
+def _has_type(s, kind):
+    if kind == 'date': return pd.api.types.is_datetime64_any_dtype(s)
+    if kind == 'category': return isinstance(s.dtype, pd.CategoricalDtype) and not s.isna().any()
+    return s.dtype == kind
+
+
+def conform(df, key):
+    # Marco ya en memoria (editado) -> mismos tipos que to_typed, convirtiendo sólo
+    # las columnas que no los tienen; el texto sin valor queda como ''
+    missing = [c for c in COLS[key] if c not in df.columns]
+    if missing: df = df.assign(**{c: '' for c in missing})
+    fix = {}
+    for col in df.columns:
+        kind = TYPES[key].get(col)
+        if kind is not None:
+            if not _has_type(df[col], kind): fix[col] = _typed(df[col], kind)
+        elif (df[col].dtype == object or pd.api.types.is_string_dtype(df[col].dtype)) and df[col].isna().any():
+            fix[col] = df[col].fillna('')
+    return df.assign(**fix) if fix else df
+
+
+def append_typed(base, rows, key):
+    # Filas nuevas (tal cual llegan) al final de un marco ya tipado: sólo se tipan
+    # ellas; las categorías se amplían para que concat no degrade a object
+    new = to_typed(pd.DataFrame(to_rows(rows.reindex(columns=base.columns)), columns=list(base.columns)), key)
+    cats = {c: pd.CategoricalDtype(base[c].cat.categories.union(new[c].cat.categories))
+            for c in base.columns if isinstance(base[c].dtype, pd.CategoricalDtype) and isinstance(new[c].dtype, pd.CategoricalDtype)}
+    return pd.concat([base.astype(cats), new.astype(cats)], ignore_index=True)
+
+
+def to_rows(df):
+    # Tipos -> valores planos para escribir (sin NaN/NaT, fechas como texto)
+    cols = []
+    for col in df.columns:
+        s = df[col]
+        if col in DATE_COLS or pd.api.types.is_datetime64_any_dtype(s):
+            s = pd.to_datetime(s, errors='coerce', format='mixed').dt.strftime(DATE_FMT)
+        elif s.dtype == 'float32':
+            s = s.astype('float64').round(6)
+        cols.append(s.astype(object).where(s.notna(), '').tolist())
+    return [list(r) for r in zip(*cols)]
+
+
+def fmt_date(v):
+    return '' if pd.isna(v) else pd.Timestamp(v).strftime(DATE_FMT)
+
+
+def editable(df):
+    # El editor convierte las categorías en selectbox cerrados; se le pasan como texto
+    cats = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    return df.astype({c: str for c in cats}) if cats else df
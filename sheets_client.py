@@ -0,0 +1,92 @@
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from gspread.client import Client
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+
+# --- CLIENTE SHEETS CON CONTROL DE CUOTA ---
+# Un único cliente por proceso (compartido por todas las sesiones de Streamlit):
+# sesión HTTP con pool de conexiones, un token bucket para lecturas y otro para
+# escrituras (la cuota de Sheets es por minuto y usuario, separada para cada
+# tipo) y reintentos de 429/5xx con backoff exponencial y jitter.
+# Sólo las lecturas (GET) se reintentan ante 5xx o fallos de red: una escritura
+# cuya respuesta se pierde puede haberse aplicado, así que sólo se repite con 429
+# (rechazada por cuota, nunca aplicada).
+READS_PER_MIN = 55   # cuota de Google: 60/min por usuario; se deja margen
+WRITES_PER_MIN = 55
+BURST = 5            # ráfaga máxima: BURST + tasa nunca supera 60 en un minuto
+RETRIES = 5
+BACKOFF = 1.0        # segundos; se dobla en cada intento (con jitter completo)
+MAX_BACKOFF = 32.0
+TIMEOUT = 30
+POOL = 10
+RETRY_STATUS = {429, 500, 502, 503, 504}  # lecturas
+RETRY_STATUS_WRITE = {429}               # escrituras
+
+
+class TokenBucket:
+    def __init__(self, per_min, burst=BURST):
+        self.rate = per_min / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # Bloquea hasta que haya un token; devuelve los segundos esperados
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait); waited += wait
+
+
+def _retry_after(response):
+    try: return float(response.headers.get('Retry-After'))
+    except (AttributeError, TypeError, ValueError): return None
+
+
+class ThrottledHTTPClient(HTTPClient):
+    # Todas las llamadas de gspread pasan por request(): aquí se espera turno y se reintenta
+    reads = TokenBucket(READS_PER_MIN)
+    writes = TokenBucket(WRITES_PER_MIN)
+    retries = RETRIES
+
+    def __init__(self, auth, session=None):
+        super().__init__(auth, session)
+        adapter = HTTPAdapter(pool_connections=POOL, pool_maxsize=POOL)
+        self.session.mount('https://', adapter)
+        self.timeout = TIMEOUT
+
+    def request(self, method, endpoint, *args, **kwargs):
+        delay = BACKOFF
+        read = method.upper() == 'GET'
+        for attempt in range(self.retries + 1):
+            if 'sheets.googleapis' in endpoint: (self.reads if read else self.writes).acquire()
+            try:
+                return super().request(method, endpoint, *args, **kwargs)
+            except APIError as e:
+                status = getattr(e.response, 'status_code', None)
+                if status not in (RETRY_STATUS if read else RETRY_STATUS_WRITE) or attempt == self.retries: raise
+                wait = _retry_after(e.response)
+            except (requests.ConnectionError, requests.Timeout):
+                if not read or attempt == self.retries: raise
+                wait = None
+            time.sleep(wait if wait is not None else random.uniform(0, min(MAX_BACKOFF, delay)))
+            delay *= 2
+
+
+def authorize(credentials, reads_per_min=None, writes_per_min=None):
+    # Igual que gspread.authorize, con el cliente HTTP limitado
+    if reads_per_min: ThrottledHTTPClient.reads = TokenBucket(reads_per_min)
+    if writes_per_min: ThrottledHTTPClient.writes = TokenBucket(writes_per_min)
+    return Client(auth=credentials, http_client=ThrottledHTTPClient)
@@ -0,0 +1,60 @@
+import json
+import os
+import threading
+import pandas as pd
+from schema import TABS, to_typed
+
+# --- COPIA LOCAL (PARQUET) ---
+# Un fichero Parquet por pestaña con lo último conocido (descargado o editado).
+# Al arrancar se sirve desde aquí sin esperar a la red; meta.json guarda cuándo
+# se escribió cada pestaña y si tiene cambios locales aún sin subir (dirty).
+
+
+class SnapshotStore:
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._meta = self._read_meta()
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.parquet")
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.root, 'meta.json')) as f: return json.load(f)
+        except (OSError, ValueError): return {}
+
+    def _write_meta(self):
+        tmp = os.path.join(self.root, 'meta.json.tmp')
+        with open(tmp, 'w') as f: json.dump(self._meta, f)
+        os.replace(tmp, os.path.join(self.root, 'meta.json'))
+
+    def has(self, key):
+        return key in self._meta and os.path.exists(self._path(key))
+
+    def load(self, key):
+        return to_typed(pd.read_parquet(self._path(key), memory_map=True), key)
+
+    def save(self, key, df, dirty=False):
+        # Escritura atómica: nunca queda un Parquet a medias si el proceso muere
+        text = [c for c in df.columns if df[c].dtype == object]
+        out = df.assign(**{c: df[c].fillna('').astype(str) for c in text})
+        tmp = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        out.reset_index(drop=True).to_parquet(tmp, index=False)
+        os.replace(tmp, self._path(key))
+        with self._lock:
+            self._meta[key] = {'saved': pd.Timestamp.now().isoformat(timespec='seconds'), 'dirty': bool(dirty)}
+            self._write_meta()
+
+    def mark(self, key, dirty):
+        with self._lock:
+            if key not in self._meta: return
+            self._meta[key]['dirty'] = bool(dirty)
+            self._write_meta()
+
+    def saved_at(self, key):
+        return self._meta.get(key, {}).get('saved')
+
+    def dirty(self):
+        return [k for k in TABS if self._meta.get(k, {}).get('dirty') and self.has(k)]
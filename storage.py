@@ -0,0 +1,374 @@
+import os
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import rowcol_to_a1
+from schema import TABS, COLS, NUM_COLS, conform, empty_frame, to_rows, to_typed
+
+# Índices del motor local (tab -> columnas)
+INDEXES = {'journal': ['Fecha', 'Cuenta'], 'finance': ['Fecha', 'Concepto'], 'objectives': ['Fecha_Limite']}
+
+
+# --- MOTORES ---
+class StorageBackend:
+    label = ""
+
+    def load(self, key):
+        raise NotImplementedError
+
+    def save(self, df, key):
+        raise NotImplementedError
+
+    def load_many(self, keys):
+        return {k: self.load(k) for k in keys}
+
+    def save_many(self, frames):
+        # {key: df}; los motores que pueden agrupar escrituras lo sobrescriben
+        for key, df in frames.items(): self.save(df, key)
+
+    def append(self, df, key):
+        # Alta de filas nuevas; los motores con inserción directa lo sobrescriben
+        self.save(pd.concat([self.load(key), df], ignore_index=True), key)
+
+
+def _reopen_on_error(fn):
+    # Un fallo puede venir de un handle viejo (hoja borrada o renombrada): se vuelve a abrir en la siguiente
+    def call(self, *args, **kwargs):
+        try: return fn(self, *args, **kwargs)
+        except Exception:
+            self.reset()
+            raise
+    return call
+
+
+class SheetsBackend(StorageBackend):
+    label = "✅ Conectado a Google Drive"
+
+    def __init__(self, client_factory, sheet_name, sheet_key=None):
+        self.client_factory = client_factory
+        self.sheet_name = sheet_name
+        self.sheet_key = sheet_key  # con ID se evita la búsqueda por nombre en Drive
+        self._snapshots = {}  # key -> últimas celdas conocidas de la hoja (cabecera incluida)
+        self._raw = set()     # fotos aún tal cual se leyeron: se normalizan en el primer guardado
+        self._writes = Counter()  # key -> escrituras empezadas/terminadas (invalida lecturas en vuelo)
+        self._sh = None       # handles reutilizados: abrir la hoja cuesta dos peticiones
+        self._ws = {}
+        self._lock = threading.Lock()
+
+    def _spreadsheet(self):
+        with self._lock:
+            if self._sh is None:
+                client = self.client_factory()
+                self._sh = client.open_by_key(self.sheet_key) if self.sheet_key else client.open(self.sheet_name)
+            return self._sh
+
+    def reset(self):
+        # Tras un fallo (hoja borrada/renombrada) se vuelve a abrir todo en la siguiente llamada
+        with self._lock: self._sh, self._ws = None, {}
+
+    def _worksheet(self, key):
+        if key in self._ws: return self._ws[key], False
+        sh = self._spreadsheet()
+        try: ws, created = sh.worksheet(TABS[key]), False
+        except WorksheetNotFound:
+            ws, created = sh.add_worksheet(title=TABS[key], rows=100, cols=20), True
+            ws.append_row(COLS[key])
+            self._snapshots[key] = [_norm_row(COLS[key])]
+        self._ws[key] = ws
+        return ws, created
+
+    @_reopen_on_error
+    def load(self, key):
+        ws, created = self._worksheet(key)
+        if created: return empty_frame(key)
+        seen = self._writes[key]
+        values = ws.get_all_values()
+        self._remember(key, values, seen)
+        if len(values) < 2: return empty_frame(key)
+        return to_typed(pd.DataFrame(values[1:], columns=values[0]), key)
+
+    @_reopen_on_error
+    def load_many(self, keys):
+        # Un values:batchGet para todas las pestañas (más los metadatos la primera vez)
+        sh = self._spreadsheet()
+        if not all(k in self._ws for k in keys):
+            self._ws.update({k: ws for ws in sh.worksheets() for k in TABS if TABS[k] == ws.title})
+        existing = {TABS[k] for k in self._ws}
+        for k in keys:
+            if TABS[k] not in existing:
+                self._ws[k] = sh.add_worksheet(title=TABS[k], rows=100, cols=20)
+                self._ws[k].append_row(COLS[k])
+        seen = {k: self._writes[k] for k in keys}
+        resp = sh.values_batch_get([f"'{TABS[k]}'" for k in keys])
+        out = {}
+        for k, vr in zip(keys, resp.get('valueRanges', [])):
+            values = vr.get('values', [])
+            if TABS[k] not in existing: values = [COLS[k]]
+            self._remember(k, values, seen[k])
+            out[k] = to_typed(pd.DataFrame(values[1:], columns=values[0]), k) if len(values) > 1 else empty_frame(k)
+        return out
+
+    def _remember(self, key, values, seen):
+        # Guardar la foto sin normalizar: la carga en frío no paga _norm celda a celda.
+        # seen: contador de escrituras antes de leer; si cambió, la lectura se cruzó con una
+        # escritura (p.ej. el hilo de reconciliación) y la foto puede ser anterior a ella
+        with self._lock:
+            if self._writes[key] != seen: return
+            self._snapshots[key] = values
+            self._raw.add(key)
+
+    @contextmanager
+    def _writing(self, keys):
+        # El contador sube al empezar y al terminar (también si falla): ninguna lectura
+        # que se solape con la escritura llega a guardar su foto
+        self._bump(keys)
+        try: yield
+        finally: self._bump(keys)
+
+    def _bump(self, keys):
+        with self._lock: self._writes.update(keys)
+
+    def _wrote(self, key, snapshot, raw=False):
+        # Foto tras una escritura confirmada; se sube el contador en el mismo paso para
+        # que una lectura más vieja no la pise después
+        with self._lock:
+            self._writes[key] += 1
+            self._snapshots[key] = snapshot
+            if raw: self._raw.add(key)
+            else: self._raw.discard(key)
+
+    def _known(self, key):
+        # Foto normalizada (se normaliza aquí la primera vez que hace falta comparar)
+        if key in self._raw:
+            self._snapshots[key] = [_norm_row(r) for r in self._snapshots[key]]
+            self._raw.discard(key)
+        return self._snapshots.get(key)
+
+    def save(self, df, key):
+        self.save_many({key: df})
+
+    @_reopen_on_error
+    def save_many(self, frames):
+        with self._writing(list(frames)): self._save_many(frames)
+
+    def _save_many(self, frames):
+        # Los cambios de todas las pestañas viajan en un solo values:batchUpdate;
+        # las que no tienen foto previa (o cambian de cabecera) se reescriben aparte
+        data, staged, rewrites = [], {}, []
+        for key, df in frames.items():
+            # Con los tipos del esquema: un RR ensanchado a float64 (altas del editor,
+            # concat de la app) se escribiría con el ruido de float32 y cambiaría toda la columna
+            df = conform(df, key)
+            values = [df.columns.values.tolist()] + to_rows(df)
+            new = [_norm_row(r) for r in values]
+            old = self._known(key)
+            if not old or old[0] != new[0]:
+                rewrites.append((key, values, new)); continue
+            data += [dict(u, range=f"'{TABS[key]}'!{u['range']}") for u in diff_ranges(old, new, values)]
+            staged[key] = new
+        if data:
+            self._spreadsheet().values_batch_update({'valueInputOption': 'RAW', 'data': data})
+        for key, new in staged.items(): self._wrote(key, new)
+        for key, values, new in rewrites:
+            self._rewrite(self._worksheet(key)[0], values)
+            self._wrote(key, new)
+
+    @_reopen_on_error
+    def append(self, df, key):
+        with self._writing([key]): self._append(df, key)
+
+    def _append(self, df, key):
+        # Sólo las filas nuevas, en un values:update justo debajo de la última fila
+        # conocida (no values:append): si la respuesta se pierde y se reintenta, se
+        # vuelve a escribir en el mismo sitio en lugar de duplicar los trades
+        if key not in self._snapshots: self.load(key)
+        ws, _ = self._worksheet(key)
+        # Sólo hacen falta la cabecera y el número de filas: la foto puede seguir sin
+        # normalizar (_norm es idempotente, así que mezclar filas ya normalizadas no importa)
+        with self._lock: known, raw = self._snapshots[key], key in self._raw
+        header = known[0] if known else COLS[key]
+        rows = to_rows(conform(df, key).reindex(columns=header))
+        if not rows: return
+        if not known: rows = [list(header)] + rows
+        ws.update(rows, rowcol_to_a1(len(known) + 1, 1), value_input_option='RAW')
+        self._wrote(key, known + [_norm_row(r) for r in rows], raw)
+
+    def _rewrite(self, ws, values):
+        # Plan B: escribir todo y luego limpiar lo sobrante (nunca clear antes de update).
+        # Los rangos de limpieza son abiertos por abajo ("A101:T"): el handle está en caché
+        # y su row_count puede no contar las filas añadidas después.
+        ws.update(values, 'A1')
+        n, w = len(values), max(len(r) for r in values)
+        last_col = _col(max(ws.col_count, w))
+        leftovers = [f"{rowcol_to_a1(n + 1, 1)}:{last_col}"]
+        if ws.col_count > w: leftovers.append(f"{rowcol_to_a1(1, w + 1)}:{last_col}")
+        ws.batch_clear(leftovers)
+
+
+def _col(n):
+    return rowcol_to_a1(1, n)[:-1]
+
+
+@lru_cache(maxsize=1 << 16)  # cuentas, activos, fechas... se repiten en casi todas las filas
+def _norm(v):
+    # Forma canónica de una celda para comparar lo leído con lo que se va a escribir
+    if v is None or v == '': return ''
+    try:
+        f = float(v)
+        if f == f: return int(f) if f.is_integer() else f
+    except (TypeError, ValueError): pass
+    return str(v)
+
+
+def _norm_row(row):
+    return [_norm(v) for v in row]
+
+
+def diff_ranges(old, new, values):
+    # Filas añadidas, cambiadas o borradas (se dejan en blanco) agrupadas en rangos contiguos.
+    # old/new vienen normalizadas para comparar; values son las celdas reales a escribir.
+    width = max(max(len(r) for r in old), max(len(r) for r in new))
+    pad = lambda r: list(r) + [''] * (width - len(r))
+    changed = []
+    for i in range(max(len(old), len(new))):
+        a = pad(old[i]) if i < len(old) else [''] * width
+        b = pad(new[i]) if i < len(new) else [''] * width
+        if a != b: changed.append((i, pad(values[i]) if i < len(values) else [''] * width))
+    updates = []
+    for i, row in changed:
+        if updates and updates[-1]['end'] == i - 1:
+            updates[-1]['values'].append(row); updates[-1]['end'] = i
+        else:
+            updates.append({'start': i, 'end': i, 'values': [row]})
+    return [{'range': f"{rowcol_to_a1(u['start'] + 1, 1)}:{rowcol_to_a1(u['end'] + 1, width)}", 'values': u['values']} for u in updates]
+
+
+class SQLiteBackend(StorageBackend):
+    label = "💾 Base de datos local (SQLite)"
+
+    def __init__(self, path):
+        self.path = path
+        self._known = {}  # key -> (rowids, hash por fila) de lo último leído o escrito
+        self._lock = threading.Lock()  # lectura+foto y escritura+foto nunca se cruzan
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            for key, cols in COLS.items():
+                defs = ", ".join(f'"{c}" {"REAL" if c in NUM_COLS else "TEXT"}' for c in cols)
+                con.execute(f'CREATE TABLE IF NOT EXISTS "{TABS[key]}" ({defs})')
+                # Migración: columnas añadidas al esquema después de crear la tabla
+                have = {r[1] for r in con.execute(f'PRAGMA table_info("{TABS[key]}")')}
+                for c in cols:
+                    if c not in have: con.execute(f'ALTER TABLE "{TABS[key]}" ADD COLUMN "{c}" {"REAL" if c in NUM_COLS else "TEXT"}')
+                for col in INDEXES.get(key, []):
+                    con.execute(f'CREATE INDEX IF NOT EXISTS "ix_{key}_{col}" ON "{TABS[key]}" ("{col}")')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _read(self, con, key):
+        df = pd.read_sql_query(f'SELECT rowid AS _rowid, * FROM "{TABS[key]}" ORDER BY rowid', con)
+        rowids = df.pop('_rowid').to_numpy()
+        df = to_typed(df, key)
+        self._known[key] = (rowids, _row_hashes(conform(df, key)))
+        return df
+
+    def load(self, key):
+        with self._lock, self._connect() as con:
+            return self._read(con, key)
+
+    def load_many(self, keys):
+        with self._lock, self._connect() as con:
+            return {k: self._read(con, k) for k in keys}
+
+    def save(self, df, key):
+        # Sólo las filas que cambian respecto a lo último leído/escrito (por rowid):
+        # UPDATE de las editadas, DELETE de las quitadas e INSERT de las nuevas al final.
+        # Sin foto, con la tabla tocada desde fuera o con altas en medio se reescribe todo.
+        cols = COLS[key]
+        frame = conform(df.reindex(columns=cols), key)
+        hashes = _row_hashes(frame)
+        table, names = TABS[key], ", ".join(f'"{c}"' for c in cols)
+        marks = ", ".join("?" * (len(cols) + 1))
+        with self._lock, self._connect() as con:
+            count, top = con.execute(f'SELECT count(*), coalesce(max(rowid), 0) FROM "{table}"').fetchone()
+            plan = _row_plan(self._known.get(key), hashes, count, top)
+            if plan is None:
+                # Una sola transacción: o se escribe todo o nada
+                con.execute(f'DELETE FROM "{table}"')
+                rowids = np.arange(1, len(frame) + 1)
+                con.executemany(f'INSERT INTO "{table}" (rowid, {names}) VALUES ({marks})',
+                                [[i] + r for i, r in zip(rowids.tolist(), to_rows(frame))])
+            else:
+                update, delete, insert, rowids = plan
+                if len(update):
+                    sets = ", ".join(f'"{c}" = ?' for c in cols)
+                    con.executemany(f'UPDATE "{table}" SET {sets} WHERE rowid = ?',
+                                    [r + [i] for r, i in zip(to_rows(frame.iloc[update]), rowids[update].tolist())])
+                if len(delete):
+                    con.executemany(f'DELETE FROM "{table}" WHERE rowid = ?', [[i] for i in delete.tolist()])
+                if len(insert):
+                    con.executemany(f'INSERT INTO "{table}" (rowid, {names}) VALUES ({marks})',
+                                    [[i] + r for i, r in zip(rowids[insert].tolist(), to_rows(frame.iloc[insert]))])
+            self._known[key] = (rowids, hashes)
+
+    def append(self, df, key):
+        cols = COLS[key]
+        frame = conform(df.reindex(columns=cols), key)
+        table, names = TABS[key], ", ".join(f'"{c}"' for c in cols)
+        marks = ", ".join("?" * (len(cols) + 1))
+        with self._lock, self._connect() as con:
+            count, top = con.execute(f'SELECT count(*), coalesce(max(rowid), 0) FROM "{table}"').fetchone()
+            rowids = np.arange(top + 1, top + 1 + len(frame))
+            con.executemany(f'INSERT INTO "{table}" (rowid, {names}) VALUES ({marks})',
+                            [[i] + r for i, r in zip(rowids.tolist(), to_rows(frame))])
+            known = self._known.pop(key, None)
+            if known is not None and _matches(known[0], count, top):
+                self._known[key] = (np.concatenate([known[0], rowids]), np.concatenate([known[1], _row_hashes(frame)]))
+
+
+def _row_hashes(frame):
+    # Huella por fila de un marco ya normalizado (conform): igual contenido, igual hash
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def _matches(rowids, count, top):
+    # La foto sigue valiendo si la tabla no se ha tocado desde fuera
+    return len(rowids) == count and (rowids[-1] if len(rowids) else 0) == top
+
+
+def _row_plan(known, hashes, count, top):
+    # Compara por posición lo conocido con lo nuevo: prefijo y sufijo comunes se dejan;
+    # en el tramo del medio se actualizan las filas emparejadas que cambian, se borran
+    # las viejas sobrantes y se insertan las nuevas (sólo al final: el rowid da el orden).
+    # -> (posiciones a UPDATE, rowids a DELETE, posiciones a INSERT, rowids resultantes) o None
+    if known is None or not _matches(known[0], count, top): return None
+    rowids, old = known
+    n, m = len(old), len(hashes)
+    k = min(n, m)
+    diff = old[:k] != hashes[:k]
+    head = int(diff.argmax()) if diff.any() else k
+    same = old[n - (k - head):][::-1] == hashes[m - (k - head):][::-1] if k > head else np.zeros(0, bool)
+    tail = int(same.argmin()) if not same.all() else len(same)
+    pairs = min(n - tail, m - tail) - head
+    if m - tail - head > pairs and tail: return None
+    idx = np.arange(head, head + pairs)
+    update = idx[old[idx] != hashes[idx]]
+    delete = rowids[head + pairs: n - tail]
+    insert = np.arange(head + pairs, m - tail)
+    new_ids = np.concatenate([rowids[:head + pairs], np.arange(top + 1, top + 1 + len(insert)), rowids[n - tail:]]).astype(np.int64)
+    return update, delete, insert, new_ids
+
+
+def get_backend(config, client_factory=None):
+    # config: {'backend': 'sheets'|'sqlite', 'path': ..., 'sheet_name': ...}
+    kind = (config.get('backend') or 'sheets').lower()
+    if kind == 'sqlite':
+        return SQLiteBackend(config.get('path') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trading.db'))
+    if kind == 'sheets':
+        return SheetsBackend(client_factory, config.get('sheet_name') or "Trading_Database", config.get('sheet_key'))
+    raise ValueError(f"Motor de almacenamiento desconocido: {kind}")
@@ -3,10 +3,25 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, date
-import gspread
+import time
+import sheets_client
 from oauth2client.service_account import ServiceAccountCredentials
-import calendar
 import os
+import importlib
+from schema import TABS, COLS, editable, fmt_date
+from storage import get_backend
+from cache import TabCache
+from snapshot import SnapshotStore
+from perf import Recorder
+from write_queue import WriteBehind
+from analytics import PnLIndex, RiskMetrics, RuleTracker
+from finance import pending_expenses
+from importer import import_fills
+from journal import fan_out, format_members, parse_members, resolve_groups
+from grid import apply_edits, filter_frame, page_count, page_of
+from equity import PORTFOLIO, EquityCurves
+from montecarlo import build_jobs, make_pool, run
+from calendar_view import DAYS_SHORT, agenda_cell, month_html, pnl_cell, renewals_by_day, tasks_by_date, year_html
 
 # --- CONFIGURACIÓN DE PÁGINA ---
 st.set_page_config(page_title="Life & Trading OS Cloud", layout="wide", page_icon="☁️")
@@ -31,6 +46,15 @@ st.markdown("""
     
     /* CALENDARIO */
     .cal-header { font-weight: bold; text-align: center; padding: 8px; opacity: 0.8; text-transform: uppercase; font-size: 0.85em; }
+    .cal-grid { display: grid; grid-template-columns: repeat(7, minmax(0, 1fr)); margin-bottom: 1rem; }
+    .cal-empty { min-height: 100px; margin: 3px; }
+    .cal-year { display: grid; gap: 12px; }
+    .cal-month-title { font-weight: 800; text-align: center; margin-bottom: 4px; }
+    .cal-grid.compact .cal-header { padding: 2px; font-size: 0.7em; }
+    .cal-grid.compact .pnl-cell, .cal-grid.compact .calendar-day-agenda, .cal-grid.compact .cal-empty { min-height: 44px; margin: 1px; padding: 2px; }
+    .cal-grid.compact .cell-date { font-size: 0.7em; margin-bottom: 1px; }
+    .cal-grid.compact .cell-pnl { font-size: 0.75em; }
+    .cal-grid.compact .event-tag { font-size: 8px; padding: 0 2px; }
     .pnl-cell, .calendar-day-agenda {
         min-height: 100px; border: 1px solid rgba(128, 128, 128, 0.2); margin: 3px;
         background-color: var(--secondary-background-color); padding: 5px; border-radius: 8px;
@@ -60,82 +84,221 @@ SHEET_NAME = "Trading_Database"
 
 @st.cache_resource
 def get_connection():
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-    creds_dict = st.secrets["service_account"]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-    return gspread.authorize(creds)
+    factory = storage_config().get('client_factory')
+    if factory:
+        # Cliente alternativo "modulo:funcion" (p.ej. el gspread en memoria de bench.py)
+        mod, _, fn = factory.partition(':')
+        return getattr(importlib.import_module(mod), fn)()
+    with get_recorder().timed('conexión', 'get_connection'):
+        scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+        creds_dict = st.secrets["service_account"]
+        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+        cfg = storage_config()
+        client = sheets_client.authorize(creds, cfg.get('reads_per_min'), cfg.get('writes_per_min'))
+    return get_recorder().instrument(client)
+
+# --- INSTRUMENTACIÓN ---
+# Log JSONL opcional: [storage] perf_log o TRADING_PERF_LOG
+@st.cache_resource
+def get_recorder():
+    return Recorder(os.environ.get("TRADING_PERF_LOG") or storage_config().get('perf_log'))
+
+# --- ALMACENAMIENTO ---
+# Motor seleccionable: [storage] backend = "sheets" | "sqlite" en secrets, o TRADING_STORAGE / TRADING_DB_PATH
+# Copia local Parquet: [storage] snapshot_dir (o TRADING_SNAPSHOT_DIR); por defecto sólo con Sheets
+# Cliente de Sheets inyectable: [storage] client_factory = "modulo:funcion" (o TRADING_CLIENT_FACTORY)
+def storage_config():
+    try: cfg = dict(st.secrets.get("storage", {}))
+    except FileNotFoundError: cfg = {}
+    cfg.setdefault('sheet_name', SHEET_NAME)
+    if os.environ.get("TRADING_STORAGE"): cfg['backend'] = os.environ["TRADING_STORAGE"]
+    if os.environ.get("TRADING_DB_PATH"): cfg['path'] = os.environ["TRADING_DB_PATH"]
+    if os.environ.get("TRADING_SNAPSHOT_DIR"): cfg['snapshot_dir'] = os.environ["TRADING_SNAPSHOT_DIR"]
+    if os.environ.get("TRADING_CLIENT_FACTORY"): cfg['client_factory'] = os.environ["TRADING_CLIENT_FACTORY"]
+    return cfg
+
+def snapshot_store(cfg):
+    path = cfg.get('snapshot_dir')
+    if not path and (cfg.get('backend') or 'sheets').lower() == 'sheets':
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.snapshots')
+    return SnapshotStore(path) if path else None
+
+@st.cache_resource
+def get_storage():
+    return get_backend(storage_config(), client_factory=get_connection)
 
 # --- GESTIÓN DE DATOS ---
-TABS = {'journal': 'Journal', 'accounts': 'Cuentas', 'finance': 'Finanzas', 'objectives': 'Objetivos', 'subs': 'Suscripciones', 'groups': 'Grupos'}
-COLS = {
-    'journal': ['Fecha', 'Cuenta', 'Activo', 'Estrategia', 'Resultado', 'RR', 'PnL', 'Emociones', 'Screenshot', 'Notas'],
-    'accounts': ['Nombre', 'Empresa', 'Tipo', 'Balance_Inicial', 'Balance_Actual', 'Balance_Objetivo', 'Dias_Objetivo', 'Costo', 'Estado', 'Fecha_Creacion', 'Manual_WD'],
-    'finance': ['Fecha', 'Tipo', 'Concepto', 'Monto'],
-    'objectives': ['ID', 'Tarea', 'Tipo', 'Fecha_Limite', 'Estado', 'Target_Dinero'],
-    'subs': ['Servicio', 'Monto', 'Dia_Renovacion'],
-    'groups': ['Nombre_Grupo', 'Cuentas']
-}
+@st.cache_resource
+def get_cache():
+    return TabCache(get_storage(), snapshots=snapshot_store(storage_config()))
 
-@st.cache_data(ttl=60)
-def load_data(key):
-    client = get_connection()
-    try:
-        sh = client.open(SHEET_NAME)
-        try: worksheet = sh.worksheet(TABS[key])
-        except: 
-            worksheet = sh.add_worksheet(title=TABS[key], rows=100, cols=20)
-            worksheet.append_row(COLS[key])
-            return pd.DataFrame(columns=COLS[key])
-        
-        data = worksheet.get_all_records()
-        df = pd.DataFrame(data)
-        if df.empty: return pd.DataFrame(columns=COLS[key])
-        
-        # Convertir números
-        for col in df.columns:
-            if col in ['PnL', 'RR', 'Monto', 'Balance_Inicial', 'Balance_Actual', 'Balance_Objetivo', 'Costo', 'Target_Dinero', 'Dias_Objetivo', 'Manual_WD', 'Dia_Renovacion']:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
-        return df
-    except: return pd.DataFrame(columns=COLS[key])
+def load_tabs(keys):
+    # Varias pestañas en una sola petición (sólo las caducadas) -> (marcos, versiones).
+    # Sin red y sin copia local no se inventa una pestaña vacía: se para la página con el error.
+    cache = get_cache()
+    before = cache.stats.copy()
+    with get_recorder().timed('carga', ",".join(keys)) as ev:
+        try: frames, versions = cache.get_versioned(keys)
+        except Exception as e:
+            ev['error'] = repr(e)
+            st.error(f"No se pudieron cargar los datos ({type(e).__name__}: {e}) y no hay copia local.")
+            st.stop()
+        delta = cache.stats - before
+        ev.update(hits=delta['hit'] + delta['stale'], misses=delta['miss'], rows=sum(len(f) for f in frames.values()))
+    return frames, versions
+
+class LazyData:
+    # Acceso perezoso: sólo se descarga lo que la página pide.
+    # versions guarda la versión de caché de *estos* marcos: los cálculos cacheados
+    # se indexan con ella, no con la versión actual (que puede haber cambiado ya).
+    def __init__(self, prefetch):
+        self.prefetch = tuple(prefetch)
+        self.frames = {}
+        self.versions = {}
+
+    def __getitem__(self, key):
+        if key not in self.frames:
+            frames, versions = load_tabs(self.prefetch if key in self.prefetch else [key])
+            self.frames.update(frames); self.versions.update(versions)
+        return self.frames[key]
+
+@st.cache_resource(max_entries=2)
+def get_pnl_index(version, _journal):
+    return PnLIndex(_journal)
+
+def pnl_index(journal, v):
+    # Un solo cubo de PnL por versión del journal (v: versiones de los marcos, LazyData.versions)
+    return get_pnl_index(v['journal'], journal)
+
+@st.cache_resource
+def get_writer():
+    writer = WriteBehind(get_storage(), get_cache())
+    writer.resume(get_cache().pending())
+    return writer
+
+@st.cache_resource(max_entries=2)
+def get_risk_engine(groups_version, _journal, _groups):
+    return RiskMetrics(_journal, _groups)
+
+def risk_metrics(journal, groups, v):
+    # Un motor por versión de grupos; con cada versión del journal sólo procesa lo añadido
+    eng = get_risk_engine(v['groups'], journal, group_members(groups, v))
+    return eng.sync(journal, v['journal']).table()
+
+@st.cache_resource(max_entries=2)
+def get_equity_curves(versions, _journal, _groups):
+    return EquityCurves(_journal, _groups)
+
+def equity_curves(journal, groups, v):
+    return get_equity_curves((v['journal'], v['groups']), journal, group_members(groups, v))
+
+@st.cache_resource(max_entries=2)
+def get_rule_tracker(accounts_version, _accounts, _journal):
+    return RuleTracker(_accounts, _journal)
+
+def account_rules(accounts, journal, v):
+    # Reglas por versión de cuentas; los trades nuevos se añaden al estado sin repetir el replay
+    eng = get_rule_tracker(v['accounts'], accounts, journal)
+    return eng.sync(journal, v['journal']).table()
+
+@st.cache_resource
+def get_mc_pool():
+    return make_pool()
+
+@st.cache_data(max_entries=8, show_spinner="Simulando...")
+def run_monte_carlo(versions, params, _accounts, _journal, _win_days):
+    return run(build_jobs(_accounts, _journal, win_days=_win_days, **dict(params)), get_mc_pool())
+
+def monte_carlo(accounts, journal, pidx, params, v):
+    # Se repite sólo si cambian cuentas, journal o parámetros
+    win_days = {n: pidx.winning_days(n) + int(m) for n, m in zip(accounts['Nombre'], accounts['Manual_WD'])}
+    return run_monte_carlo((v['accounts'], v['journal']), params, accounts, journal, win_days)
 
 def save_data(df, key):
-    client = get_connection()
-    try:
-        sh = client.open(SHEET_NAME)
-        ws = sh.worksheet(TABS[key])
-        ws.clear()
-        ws.update([df.columns.values.tolist()] + df.values.tolist())
-        st.cache_data.clear()
-    except Exception as e: st.error(f"Error al guardar: {e}")
-
-# Carga inicial
-df_journal = load_data('journal')
-df_accounts = load_data('accounts')
-df_finance = load_data('finance')
-df_objectives = load_data('objectives')
-df_subs = load_data('subs')
-df_groups = load_data('groups')
+    # Se ve al instante (caché); la escritura real va en segundo plano
+    with get_recorder().timed('guardado', key, rows=len(df)):
+        get_writer().submit(key, df)
+
+def append_data(rows, df, key):
+    # Alta sólo de filas nuevas (df = pestaña completa ya con ellas)
+    with get_recorder().timed('guardado', key, rows=len(rows)):
+        get_writer().submit_append(key, rows, df)
+
+@st.cache_resource(max_entries=2)
+def get_group_members(version, _groups):
+    return resolve_groups(_groups)
+
+def group_members(groups, v):
+    return get_group_members(v['groups'], groups)
 
 # --- UTILS ---
 def kpi_card(title, value, type="currency"):
     color = "var(--text-color)"
-    if type != "number":
+    if type != "number" and not isinstance(value, str):
         color = "#00C076" if value > 0 else "#FF4D4D" if value < 0 else "#F7B924"
-    fmt = f"${value:,.2f}" if type=="currency" else f"{value:.1f}%" if type=="percent" else f"{value:.2f}"
     if type == "simple": fmt = f"{value}"
+    else: fmt = f"${value:,.2f}" if type=="currency" else f"{value:.1f}%" if type=="percent" else f"{value:.2f}"
     st.markdown(f"""<div class="kpi-card"><div class="kpi-title">{title}</div><div class="kpi-value" style="color:{color}">{fmt}</div></div>""", unsafe_allow_html=True)
 
+def paged_editor(df, key, filter_cols, **editor_kwargs):
+    # Editor paginado y filtrado: sólo viaja la página visible.
+    # Devuelve el marco completo con los cambios aplicados, o None si no hay cambios.
+    dates = df['Fecha'].dropna()
+    lo, hi = (dates.min().date(), dates.max().date()) if not dates.empty else (date.today(), date.today())
+    fcols = st.columns(len(filter_cols) + 2)
+    # Sin rango por defecto (entran también las filas sin fecha); la clave del selector
+    # lleva el rango de los datos para que un trade nuevo fuera de él no quede oculto
+    rango = None
+    if fcols[0].checkbox("Filtrar por fecha", key=f"{key}_por_fecha"):
+        rango = fcols[0].date_input("Rango", (lo, hi), key=f"{key}_rango_{lo}_{hi}")
+    start, end = (rango + (None,))[:2] if isinstance(rango, tuple) else (rango, None)
+    filters = {c: fcols[i + 1].multiselect(c, sorted(df[c].astype(str).unique()), key=f"{key}_{c}") for i, c in enumerate(filter_cols)}
+    size = fcols[-1].selectbox("Filas", [25, 50, 100, 200], key=f"{key}_size")
+    filtered = filter_frame(df, 'Fecha', start, end, filters)
+    pages = page_count(len(filtered), size)
+    page = st.number_input(f"Página (de {pages}) · {len(filtered)} filas", 1, pages, 1, key=f"{key}_page")
+    view = page_of(filtered, page, size, 'Fecha')
+    # La clave del editor cambia con la página/filtros para no arrastrar ediciones de otra vista
+    ek = f"{key}_ed_{abs(hash((str(rango), str(filters), page, size)))}"
+    st.data_editor(editable(view).reset_index(drop=True), key=ek, hide_index=True, num_rows="dynamic", use_container_width=True, **editor_kwargs)
+    return apply_edits(df, view, st.session_state.get(ek))
+
 # --- NAVEGACIÓN ---
+# Página -> pestañas que renderiza
+PAGE_TABS = {
+    "📊 Dashboard": ['objectives', 'finance', 'journal', 'groups'],
+    "🎯 Agenda": ['objectives', 'subs'],
+    "🧠 Insights": ['journal', 'groups'],
+    "✅ Checklist": [],
+    "📓 Diario (Multi)": ['accounts', 'groups', 'journal'],
+    "🏦 Cuentas": ['accounts', 'journal', 'finance', 'groups'],
+    "💰 Finanzas Pro": ['subs', 'finance'],
+}
+run_id = get_recorder().begin_run()
 st.sidebar.title("☁️ Trading OS")
-st.sidebar.caption("✅ Conectado a Google Drive")
-if st.sidebar.button("🔄 Sincronizar"): st.cache_data.clear(); st.rerun()
-menu = st.sidebar.radio("Ir a:", ["📊 Dashboard", "🎯 Agenda", "🧠 Insights", "✅ Checklist", "📓 Diario (Multi)", "🏦 Cuentas", "💰 Finanzas Pro"])
+st.sidebar.caption(get_storage().label)
+if st.sidebar.button("🔄 Sincronizar"): get_cache().invalidate(); st.rerun()
+if get_cache().error is not None:
+    st.sidebar.warning("📴 Sin conexión: trabajando con la copia local. Los cambios se subirán al volver la red.")
+wstat = get_writer().status()
+if wstat['pending']: st.sidebar.caption(f"⏳ Guardando: {', '.join(TABS[k] for k in wstat['pending'])}")
+if wstat['failed']:
+    for k, err in wstat['failed'].items(): st.sidebar.error(f"Error al guardar {TABS[k]}: {err}")
+    if st.sidebar.button("🔁 Reintentar"): get_writer().retry(); st.rerun()
+menu = st.sidebar.radio("Ir a:", list(PAGE_TABS))
+
+# Carga por página (una sola petición con las pestañas que necesita)
+data = LazyData(PAGE_TABS[menu])
+page_t0 = time.perf_counter()
 
 # ==============================================================================
 # 1. DASHBOARD
 # ==============================================================================
 if menu == "📊 Dashboard":
     st.header("Dashboard Principal")
+    df_objectives = data['objectives']
+    df_finance = data['finance']
+    df_journal = data['journal']
     
     target = 10000.0
     if not df_objectives.empty:
@@ -168,8 +331,8 @@ if menu == "📊 Dashboard":
         total_trades = len(df_journal)
         win_rate = (wins/total_trades*100) if total_trades > 0 else 0
         avg_rr = df_journal['RR'].mean()
-        daily_pnl_global = df_journal.groupby('Fecha')['PnL'].sum()
-        total_winning_days = daily_pnl_global[daily_pnl_global >= 150].count()
+        pidx = pnl_index(df_journal, data.versions)
+        total_winning_days = pidx.winning_days()
 
         k1, k2, k3, k4 = st.columns(4)
         with k1: kpi_card("PnL Total", total_pnl, "currency")
@@ -178,10 +341,21 @@ if menu == "📊 Dashboard":
         with k4: kpi_card("Winning Days", total_winning_days, "simple")
 
         st.caption("Curva de Equity")
-        df_sorted = df_journal.sort_values('Fecha')
-        df_sorted['Acumulado'] = df_sorted['PnL'].cumsum()
-        fig = px.area(df_sorted, x='Fecha', y='Acumulado', template="plotly_dark")
-        fig.update_traces(line_color='#00C076', fillcolor='rgba(0,192,118,0.1)')
+        curves = equity_curves(df_journal, data['groups'], data.versions)
+        e1, e2 = st.columns([3, 2])
+        labels = {n: n.replace('|', ': ') for n in curves.names('Cuenta') + curves.names('Grupo')}
+        extra = e1.multiselect("Superponer", list(labels), format_func=labels.get, placeholder="Cartera")
+        rango = e2.radio("Rango", ["Todo", "1A", "6M", "3M", "1M"], horizontal=True)
+        start = None
+        if rango != "Todo":
+            start = curves.span()[1] - pd.DateOffset(**({'years': 1} if rango == "1A" else {'months': int(rango[0])}))
+        if extra:
+            eq = curves.overlay([PORTFOLIO] + extra, start)
+            fig = px.line(eq, x='Fecha', y='Equity', color='Serie', template="plotly_dark")
+        else:
+            eq = curves.curve(PORTFOLIO, start)
+            fig = px.area(eq, x='Fecha', y='Equity', template="plotly_dark")
+            fig.update_traces(line_color='#00C076', fillcolor='rgba(0,192,118,0.1)')
         fig.update_layout(margin=dict(l=0,r=0,t=0,b=0), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)')
         st.plotly_chart(fig, use_container_width=True)
     else:
@@ -192,6 +366,8 @@ if menu == "📊 Dashboard":
 # ==============================================================================
 elif menu == "🎯 Agenda":
     st.header("Agenda")
+    df_objectives = data['objectives']
+    df_subs = data['subs']
     c1, c2 = st.columns([1, 2])
     
     with c1:
@@ -229,7 +405,7 @@ elif menu == "🎯 Agenda":
             
             for i, r in tasks_pending.iterrows():
                 # Checkbox para marcar como hecho
-                is_done = st.checkbox(f"**{r['Fecha_Limite']}**: {r['Tarea']}", key=f"t_{i}")
+                is_done = st.checkbox(f"**{fmt_date(r['Fecha_Limite'])}**: {r['Tarea']}", key=f"t_{i}")
                 if is_done:
                     df_objectives.at[i, 'Estado'] = 'Hecho'
                     save_data(df_objectives, 'objectives')
@@ -238,51 +414,39 @@ elif menu == "🎯 Agenda":
             st.info("¡Todo limpio! No hay tareas pendientes.")
 
     with c2:
-        st.subheader(f"Calendario: {datetime.now().strftime('%B')}")
-        
-        # Preparar datos para el calendario
-        cal = calendar.monthcalendar(datetime.now().year, datetime.now().month)
-        cols = st.columns(7)
-        dias = ['LUN', 'MAR', 'MIE', 'JUE', 'VIE', 'SAB', 'DOM']
-        for i, c in enumerate(cols): c.markdown(f"<div class='cal-header'>{dias[i]}</div>", unsafe_allow_html=True)
-        
-        for week in cal:
-            cols = st.columns(7)
-            for i, d in enumerate(week):
-                with cols[idx := i]:
-                    if d != 0:
-                        current_date_str = str(date(datetime.now().year, datetime.now().month, d))
-                        html_evts = ""
-                        
-                        # 1. Buscar TAREAS para este día
-                        day_tasks = df_objectives[df_objectives['Fecha_Limite'] == current_date_str]
-                        for _, t in day_tasks.iterrows():
-                            # Estilo diferente si está hecha o pendiente
-                            style_class = "evt-task" if t['Estado'] != 'Hecho' else "evt-done"
-                            html_evts += f"<span class='event-tag {style_class}'>{t['Tarea']}</span>"
-                        
-                        # 2. Buscar PAGOS (Suscripciones) para este día
-                        for _, s in df_subs.iterrows():
-                            if int(s['Dia_Renovacion']) == d:
-                                html_evts += f"<span class='event-tag evt-bill'>💸 {s['Servicio']}</span>"
-
-                        st.markdown(f"""
-                        <div class='calendar-day-agenda'>
-                            <div class='cell-date'>{d}</div>
-                            {html_evts}
-                        </div>""", unsafe_allow_html=True)
-                    else:
-                        st.markdown("<div style='min-height:100px'></div>", unsafe_allow_html=True)
+        now = datetime.now()
+        vista = st.radio("Vista", ["Mes", "Año"], horizontal=True, key="agenda_vista")
+        cell = agenda_cell(tasks_by_date(df_objectives), renewals_by_day(df_subs))
+        if vista == "Mes":
+            st.subheader(f"Calendario: {now.strftime('%B')}")
+            st.markdown(month_html(now.year, now.month, cell), unsafe_allow_html=True)
+        else:
+            st.subheader(f"Calendario: {now.year}")
+            st.markdown(year_html(now.year, cell), unsafe_allow_html=True)
 
 # ==============================================================================
 # 3. INSIGHTS
 # ==============================================================================
 elif menu == "🧠 Insights":
     st.header("Analítica")
+    df_journal = data['journal']
+    df_groups = data['groups']
     if df_journal.empty: st.info("Registra trades para ver datos.")
     else:
+        rm = risk_metrics(df_journal, df_groups, data.versions)
+        tot = rm[rm['Ámbito'] == 'Total'].iloc[0].fillna(0)
+        k1, k2, k3, k4, k5, k6 = st.columns(6)
+        with k1: kpi_card("Max Drawdown", tot['Max DD'], "currency")
+        with k2: kpi_card("Profit Factor", tot['Profit Factor'], "number")
+        with k3: kpi_card("Expectancy", tot['Expectancy'], "currency")
+        with k4: kpi_card("Sharpe", tot['Sharpe'], "number")
+        with k5: kpi_card("Sortino", tot['Sortino'], "number")
+        with k6: kpi_card("Rachas W / L", f"{tot['Racha W']} / {tot['Racha L']}", "simple")
+        st.caption(f"Drawdown más largo: {tot['DD Días']} días operados · Sharpe/Sortino anualizados sobre PnL diario")
+        amb = st.radio("Métricas por", ["Cuenta", "Estrategia", "Grupo"], horizontal=True)
+        st.dataframe(rm[rm['Ámbito'] == amb].drop(columns='Ámbito'), hide_index=True, use_container_width=True)
+
         df = df_journal.copy()
-        df['Fecha'] = pd.to_datetime(df['Fecha'])
         df['Dia'] = df['Fecha'].dt.day_name()
         c1, c2 = st.columns(2)
         with c1:
@@ -310,20 +474,23 @@ elif menu == "✅ Checklist":
 # ==============================================================================
 elif menu == "📓 Diario (Multi)":
     st.header("Diario")
+    df_accounts = data['accounts']
+    df_groups = data['groups']
+    df_journal = data['journal']
     with st.expander("➕ NUEVO TRADE", expanded=True):
         mode = st.radio("Modo:", ["Cuenta Única", "Grupo"], horizontal=True)
         with st.form("trade"):
             c1, c2 = st.columns(2)
             d = c1.date_input("Fecha")
-            targets = []
+            members = parse_members('')
             if mode == "Cuenta Única":
                 accs = df_accounts[df_accounts['Estado']=='Activa']['Nombre'].unique()
                 sel = c2.selectbox("Cuenta", accs if len(accs)>0 else ["General"])
-                targets = [sel]
+                members = pd.DataFrame({'Cuenta': [sel], 'Mult': [1.0]})
             else:
-                grps = df_groups['Nombre_Grupo'].unique()
-                sel = c2.selectbox("Grupo", grps if len(grps)>0 else [])
-                if len(grps)>0: targets = df_groups[df_groups['Nombre_Grupo']==sel]['Cuentas'].values[0].split(',')
+                grps = group_members(df_groups, data.versions)
+                sel = c2.selectbox("Grupo", list(grps))
+                if sel is not None: members = grps[sel]
             
             c3, c4, c5 = st.columns(3)
             pnl = c3.number_input("PnL ($)", step=10.0)
@@ -335,50 +502,55 @@ elif menu == "📓 Diario (Multi)":
             link = c7.text_input("Link Foto (Gyazo/Lightshot)")
             
             if st.form_submit_button("Guardar"):
-                rows = []
-                for t in targets:
-                    rows.append({
-                        'Fecha': str(d), 'Cuenta': t.strip(), 'Activo': 'NQ', 'Estrategia': strat, 
-                        'Resultado': res, 'RR': rr, 'PnL': pnl, 'Emociones': '', 
-                        'Screenshot': link, 'Notas': ''
-                    })
-                df_journal = pd.concat([df_journal, pd.DataFrame(rows)], ignore_index=True)
-                save_data(df_journal, 'journal'); st.success("Guardado"); st.rerun()
-
-    st.subheader(f"Mes: {datetime.now().strftime('%B')}")
-    cal = calendar.monthcalendar(datetime.now().year, datetime.now().month)
-    cols = st.columns(7)
-    for i, d in enumerate(['L','M','X','J','V','S','D']): cols[i].markdown(f"<div class='cal-header'>{d}</div>", unsafe_allow_html=True)
-    
-    df_journal['Fecha'] = pd.to_datetime(df_journal['Fecha'])
-    m_data = df_journal[df_journal['Fecha'].dt.month == datetime.now().month]
-    daily = m_data.groupby(m_data['Fecha'].dt.day)['PnL'].sum()
-    
-    for week in cal:
-        cols = st.columns(7)
-        for i, d in enumerate(week):
-            if d!=0:
-                pnl = daily.get(d, 0)
-                cls = "win-day" if pnl>0 else "loss-day" if pnl<0 else ""
-                txt = f"<span class='{'win-text' if pnl>0 else 'loss-text'}'>${pnl:,.0f}</span>" if pnl!=0 else "-"
-                cols[i].markdown(f"<div class='pnl-cell {cls}'><div class='cell-date'>{d}</div><div class='cell-pnl'>{txt}</div></div>", unsafe_allow_html=True)
-            else: cols[i].markdown("<div style='min-height:110px'></div>", unsafe_allow_html=True)
-            
+                rows = fan_out({
+                    'Fecha': str(d), 'Activo': 'NQ', 'Estrategia': strat,
+                    'Resultado': res, 'RR': rr, 'PnL': pnl, 'Emociones': '',
+                    'Screenshot': link, 'Notas': ''
+                }, members)[COLS['journal']]
+                df_journal = pd.concat([df_journal, rows], ignore_index=True)
+                append_data(rows, df_journal, 'journal'); st.success("Guardado"); st.rerun()
+
+    with st.expander("📥 Importar Ejecuciones (CSV)"):
+        st.caption("Exportación de fills de NinjaTrader, Tradovate... Se emparejan en trades y se omiten los ya importados.")
+        with st.form("import_fills"):
+            up = st.file_uploader("Archivo CSV", type=["csv"])
+            c1, c2, c3 = st.columns(3)
+            imp_acc = c1.text_input("Cuenta (si el CSV no la trae)")
+            imp_strat = c2.selectbox("Estrategia", ["OTRO", "RANGOS", "CANALES"])
+            imp_risk = c3.number_input("Riesgo por trade ($, para RR)", 0.0, step=50.0)
+            if st.form_submit_button("Importar") and up is not None:
+                try: rows = import_fills(up, df_journal, imp_acc or None, imp_strat, imp_risk or None)
+                except ValueError as e: st.error(str(e)); rows = None
+                if rows is not None and not rows.empty:
+                    df_journal = pd.concat([df_journal, rows], ignore_index=True)
+                    append_data(rows, df_journal, 'journal'); st.success(f"{len(rows)} trades importados"); st.rerun()
+                elif rows is not None: st.info("Nada nuevo que importar.")
+
+    now = datetime.now()
+    vista = st.radio("Vista", ["Mes", "Año"], horizontal=True, key="diario_vista")
+    cell = pnl_cell(pnl_index(df_journal, data.versions).day)
+    if vista == "Mes":
+        st.subheader(f"Mes: {now.strftime('%B')}")
+        st.markdown(month_html(now.year, now.month, cell, DAYS_SHORT), unsafe_allow_html=True)
+    else:
+        st.subheader(f"Año: {now.year}")
+        st.markdown(year_html(now.year, cell), unsafe_allow_html=True)
+
     st.markdown("---")
     st.subheader("Historial")
-    edited = st.data_editor(
-        df_journal.sort_values('Fecha', ascending=False), 
-        num_rows="dynamic", 
-        use_container_width=True,
-        column_config={"Screenshot": st.column_config.LinkColumn("Ver Foto")}
-    )
-    if st.button("💾 Guardar Cambios Tabla"): save_data(edited, 'journal'); st.success("Guardado."); st.rerun()
+    edited = paged_editor(df_journal, "hist", ['Cuenta', 'Estrategia'],
+        column_config={"Screenshot": st.column_config.LinkColumn("Ver Foto")})
+    if st.button("💾 Guardar Cambios Tabla", disabled=edited is None): save_data(edited, 'journal'); st.success("Guardado."); st.rerun()
 
 # ==============================================================================
 # 6. CUENTAS
 # ==============================================================================
 elif menu == "🏦 Cuentas":
     st.header("Gestión de Capital")
+    df_accounts = data['accounts']
+    df_journal = data['journal']
+    df_finance = data['finance']
+    df_groups = data['groups']
     tabs = st.tabs(["Activas", "Historial", "Grupos"])
     
     with tabs[0]:
@@ -396,12 +568,15 @@ elif menu == "🏦 Cuentas":
                 do = c7.number_input("Días Winning Objetivo", 5)
                 wd_manual = c8.number_input("Días Winning YA conseguidos", 0)
                 co = c9.number_input("Coste ($)", 0.0)
+                c10, c11 = st.columns(2)
+                dd_max = c10.number_input("Trailing Drawdown ($, 0 = sin)", 0.0, step=500.0)
+                dl_max = c11.number_input("Límite Pérdida Diaria ($, 0 = sin)", 0.0, step=100.0)
                 
                 if st.form_submit_button("Crear"):
                     new = pd.DataFrame([{
                         'Nombre': n, 'Empresa': e, 'Tipo': t, 'Balance_Inicial': bi, 'Balance_Actual': ba, 
                         'Balance_Objetivo': bo, 'Dias_Objetivo': do, 'Costo': co, 'Estado': 'Activa', 
-                        'Fecha_Creacion': str(date.today()), 'Manual_WD': wd_manual
+                        'Fecha_Creacion': str(date.today()), 'Manual_WD': wd_manual, 'DD_Max': dd_max, 'Limite_Diario': dl_max
                     }])
                     df_accounts = pd.concat([df_accounts, new], ignore_index=True)
                     save_data(df_accounts, 'accounts')
@@ -414,19 +589,30 @@ elif menu == "🏦 Cuentas":
         active = df_accounts[df_accounts['Estado']=='Activa']
         if active.empty: st.info("Sin cuentas activas")
         else:
+            pidx = pnl_index(df_journal, data.versions)
+            with st.expander("🎲 Probabilidad de pasar (Monte Carlo)"):
+                with st.form("mc_form"):
+                    m1, m2, m3, m4, m5 = st.columns(5)
+                    src = m1.selectbox("Muestra de trades", ["Cuenta", "Cartera"] + sorted(df_journal['Estrategia'].astype(str).unique()))
+                    n_paths = m2.number_input("Caminos", 1000, 200000, 20000, step=1000)
+                    horizon = m3.number_input("Horizonte (días operados)", 5, 500, 60)
+                    dd_lim = m4.number_input("Límite drawdown ($, 0 = sin)", 0.0, step=500.0)
+                    trailing = m5.checkbox("Trailing", True)
+                    if st.form_submit_button("Simular"):
+                        st.session_state['mc_params'] = (('source', src), ('paths', n_paths), ('horizon', horizon), ('dd_limit', dd_lim), ('trailing', trailing))
+                if 'mc_params' in st.session_state:
+                    st.dataframe(monte_carlo(active, df_journal, pidx, st.session_state['mc_params'], data.versions), hide_index=True, use_container_width=True,
+                        column_config={"Pasa": st.column_config.ProgressColumn("Pasa", format="percent", min_value=0, max_value=1),
+                                       "Quema": st.column_config.ProgressColumn("Quema", format="percent", min_value=0, max_value=1)})
+            mc = monte_carlo(active, df_journal, pidx, st.session_state['mc_params'], data.versions).set_index('Cuenta') if 'mc_params' in st.session_state else None
+            rules = account_rules(df_accounts, df_journal, data.versions)
             for i, r in active.iterrows():
                 with st.container(border=True):
                     st.markdown(f"### 💳 {r['Nombre']} <small>({r['Tipo']})</small>", unsafe_allow_html=True)
                     c1, c2, c3 = st.columns(3)
                     
-                    auto_wd = 0
-                    pnl_j = 0
-                    if not df_journal.empty:
-                        acc_tr = df_journal[df_journal['Cuenta']==r['Nombre']]
-                        if not acc_tr.empty:
-                            pnl_j = acc_tr['PnL'].sum()
-                            daily = acc_tr.groupby('Fecha')['PnL'].sum()
-                            auto_wd = daily[daily >= 150].count()
+                    pnl_j = pidx.account_pnl(r['Nombre'])
+                    auto_wd = pidx.winning_days(r['Nombre'])
                     
                     manual_wd = r.get('Manual_WD', 0)
                     total_wd = auto_wd + manual_wd
@@ -438,18 +624,38 @@ elif menu == "🏦 Cuentas":
                     curr = r['Balance_Actual'] - r['Balance_Inicial']
                     pg = min(max(curr/tgt, 0.0), 1.0) if tgt!=0 else 0
                     c3.progress(pg, f"Meta: ${tgt:,.0f}")
+                    if mc is not None and r['Nombre'] in mc.index and mc.loc[r['Nombre'], 'Pasa'] == mc.loc[r['Nombre'], 'Pasa']:
+                        sim = mc.loc[r['Nombre']]
+                        days = f" · ~{sim['Dias_Mediana']:.0f} días" if sim['Dias_Mediana'] == sim['Dias_Mediana'] else ""
+                        c3.caption(f"🎲 Pasa: **{sim['Pasa']:.0%}** · Quema: {sim['Quema']:.0%}{days}")
+                    if str(r['Nombre']) in rules.index:
+                        ru = rules.loc[str(r['Nombre'])]
+                        c4, c5, c6 = st.columns(3)
+                        c4.metric("Balance (Journal)", f"${ru['Balance']:,.2f}", f"HWM: ${ru['HWM']:,.2f}", delta_color="off")
+                        if ru['Suelo'] == ru['Suelo']:
+                            c5.metric("Suelo Trailing DD", f"${ru['Suelo']:,.2f}", f"Margen: ${ru['Margen']:,.2f}", delta_color="normal" if ru['Margen'] > 0 else "inverse")
+                        else: c5.metric("Max DD", f"${ru['Max_DD']:,.2f}")
+                        if ru['Restante_Hoy'] == ru['Restante_Hoy']:
+                            c6.metric("Pérdida Diaria Restante", f"${ru['Restante_Hoy']:,.2f}", f"Hoy: ${ru['PnL_Hoy']:,.2f}")
+                        if pd.notna(ru['Quemada']): st.error(f"🔥 Drawdown superado el {fmt_date(ru['Quemada'])} (según el journal)")
+                        if ru['Dias_Limite'] > 0: st.warning(f"⚠️ Límite diario superado {ru['Dias_Limite']} día(s) · último: {fmt_date(ru['Ultimo_Limite'])}")
                     
                     with st.expander("⚙️ Editar / Borrar"):
                         with st.form(f"ed_{i}"):
                             c_e1, c_e2 = st.columns(2)
                             nb = c_e1.number_input("Nuevo Balance", value=float(r['Balance_Actual']))
-                            nm_wd = c_e2.number_input("Ajustar Días Winning Manuales", value=float(manual_wd))
+                            nm_wd = c_e2.number_input("Ajustar Días Winning Manuales", value=int(manual_wd), step=1)
+                            c_e3, c_e4 = st.columns(2)
+                            n_dd = c_e3.number_input("Trailing Drawdown ($, 0 = sin)", value=float(r.get('DD_Max', 0.0)), step=500.0)
+                            n_dl = c_e4.number_input("Límite Pérdida Diaria ($, 0 = sin)", value=float(r.get('Limite_Diario', 0.0)), step=100.0)
                             act = st.selectbox("Cambiar Estado", ["Mantener Activa", "Pasar a Funded", "Archivar (Perdida)", "Archivar (Retirada)"])
                             
                             c_btn1, c_btn2 = st.columns(2)
                             if c_btn1.form_submit_button("💾 Guardar Cambios"):
                                 df_accounts.at[i, 'Balance_Actual'] = nb
                                 df_accounts.at[i, 'Manual_WD'] = nm_wd
+                                df_accounts.at[i, 'DD_Max'] = n_dd
+                                df_accounts.at[i, 'Limite_Diario'] = n_dl
                                 if "Funded" in act: df_accounts.at[i, 'Tipo'] = "Funded"
                                 elif "Archivar" in act: df_accounts.at[i, 'Estado'] = "Historico"
                                 save_data(df_accounts, 'accounts'); st.rerun()
@@ -469,9 +675,11 @@ elif menu == "🏦 Cuentas":
         st.subheader("Grupos")
         with st.form("grp"):
             gn = st.text_input("Nombre Grupo")
-            acs = st.multiselect("Cuentas", active['Nombre'].unique())
+            st.caption("Marca las cuentas y su multiplicador de contratos (el PnL se escala al copiar)")
+            sel_acs = st.data_editor(pd.DataFrame({'Cuenta': active['Nombre'].unique(), 'Incluir': False, 'Mult': 1.0}),
+                hide_index=True, use_container_width=True, disabled=['Cuenta'], key="grp_members")
             if st.form_submit_button("Crear Grupo"):
-                new = pd.DataFrame([{'Nombre_Grupo': gn, 'Cuentas': ",".join(acs)}])
+                new = pd.DataFrame([{'Nombre_Grupo': gn, 'Cuentas': format_members(sel_acs[sel_acs['Incluir']])}])
                 df_groups = pd.concat([df_groups, new], ignore_index=True)
                 save_data(df_groups, 'groups'); st.success("Creado"); st.rerun()
         if not df_groups.empty: st.dataframe(df_groups)
@@ -481,6 +689,8 @@ elif menu == "🏦 Cuentas":
 # ==============================================================================
 elif menu == "💰 Finanzas Pro":
     st.header("Centro Financiero")
+    df_subs = data['subs']
+    df_finance = data['finance']
     
     with st.expander("🔄 Gestionar Suscripciones Recurrentes", expanded=False):
         c1, c2 = st.columns([2, 1])
@@ -494,20 +704,21 @@ elif menu == "💰 Finanzas Pro":
                     new = pd.DataFrame([{'Servicio': srv, 'Monto': mnt, 'Dia_Renovacion': dia}])
                     df_subs = pd.concat([df_subs, new], ignore_index=True)
                     save_data(df_subs, 'subs'); st.rerun()
+        with st.form("subs_backfill"):
+            since = st.date_input("Rellenar meses sin registrar desde", date.today().replace(day=1))
+            if st.form_submit_button("Rellenar"):
+                new = pending_expenses(df_subs, df_finance, since)
+                if not new.empty:
+                    df_finance = pd.concat([df_finance, new], ignore_index=True)
+                    save_data(df_finance, 'finance')
+                st.success(f"{len(new)} gastos generados."); st.rerun()
     
     if st.button("⚡ Generar Gastos de Este Mes"):
-        today = date.today(); count = 0
-        for _, sub in df_subs.iterrows():
-            exists = False
-            for _, fin in df_finance.iterrows():
-                try: fin_date = pd.to_datetime(fin['Fecha']).date()
-                except: continue
-                if fin_date.month == today.month and fin_date.year == today.year and fin['Concepto'] == sub['Servicio']: exists = True
-            if not exists: 
-                new = pd.DataFrame([{'Fecha': str(today), 'Tipo': 'GASTO (Suscripción)', 'Concepto': sub['Servicio'], 'Monto': -abs(sub['Monto'])}])
-                df_finance = pd.concat([df_finance, new], ignore_index=True)
-                count += 1
-        save_data(df_finance, 'finance'); st.success(f"{count} gastos generados."); st.rerun()
+        new = pending_expenses(df_subs, df_finance, date.today())
+        if not new.empty:
+            df_finance = pd.concat([df_finance, new], ignore_index=True)
+            save_data(df_finance, 'finance')
+        st.success(f"{len(new)} gastos generados."); st.rerun()
 
     st.markdown("---")
     
@@ -538,9 +749,29 @@ elif menu == "💰 Finanzas Pro":
             st.caption(f"📈 **ROI: {roi:.1f}%**")
             
             st.info("💡 Edita la tabla para corregir datos.")
-            edited_fin = st.data_editor(df_finance.sort_values('Fecha', ascending=False), use_container_width=True, num_rows="dynamic", key="fin_ed")
-            if st.button("💾 Guardar Cambios Tabla"):
+            edited_fin = paged_editor(df_finance, "fin_ed", ['Tipo'])
+            if st.button("💾 Guardar Cambios Tabla", disabled=edited_fin is None):
                 save_data(edited_fin, 'finance')
                 st.success("Guardado"); st.rerun()
         else:
             st.info("No hay datos financieros aún.")
+
+# ==============================================================================
+# PANEL DE RENDIMIENTO (OPCIONAL)
+# ==============================================================================
+rec = get_recorder()
+rec.record('página', menu, (time.perf_counter() - page_t0) * 1000)
+if st.sidebar.toggle("🛠️ Rendimiento", key="perf_panel"):
+    with st.sidebar:
+        summ = rec.summary(run_id)
+        calls = int(summ.loc[summ['kind'] == 'api', 'n'].sum()) if not summ.empty else 0
+        hits = int(summ['hits'].sum()) if not summ.empty else 0
+        misses = int(summ['misses'].sum()) if not summ.empty else 0
+        st.caption(f"Rerun #{run_id} · {calls} llamadas a la API · caché {hits} aciertos / {misses} fallos")
+        if not summ.empty:
+            st.dataframe(summ[['kind', 'name', 'n', 'ms', 'bytes_in', 'bytes_out']].rename(columns={'kind': 'Tipo', 'name': 'Paso'}),
+                         hide_index=True, use_container_width=True)
+        reads, writes = rec.quota_window()
+        st.progress(min(reads / rec.quota, 1.0), f"Lecturas Sheets último minuto: {reads}/{rec.quota}")
+        st.progress(min(writes / rec.quota, 1.0), f"Escrituras Sheets último minuto: {writes}/{rec.quota}")
+        st.download_button("⬇️ Exportar log (JSONL)", rec.export(), file_name="trading_os_perf.jsonl", mime="application/jsonl")
@@ -0,0 +1,134 @@
+import atexit
+import threading
+import time
+import pandas as pd
+
+# --- ESCRITURA DIFERIDA ---
+# save_data deja el cambio en la caché al momento y encola la escritura real.
+# Un hilo la vuelca al motor: varias escrituras seguidas de la misma pestaña
+# se funden en una (gana la última), con reintentos y backoff; las
+# reescrituras pendientes de varias pestañas salen juntas (save_many).
+# Las altas (append) viajan como filas nuevas mientras no haya una
+# reescritura completa pendiente de la misma pestaña. Lo fallido (p.ej. sin
+# red) se vuelve a intentar solo cada RETRY_EVERY segundos.
+RETRIES = 3
+BACKOFF = 1.0   # segundos; se dobla en cada reintento
+COALESCE = 0.5  # espera antes de volcar para juntar ráfagas
+RETRY_EVERY = 30
+
+
+def _merge(prev, new):
+    # prev/new: {'op': 'save'|'append', 'df': ..., 'full': marco completo tras el cambio}
+    if prev is None or new['op'] == 'save': return new
+    if prev['op'] == 'save': return dict(new, op='save', df=new['full'])
+    return dict(new, df=pd.concat([prev['df'], new['df']], ignore_index=True))
+
+
+class WriteBehind:
+    def __init__(self, backend, cache, retries=RETRIES, backoff=BACKOFF, coalesce=COALESCE, retry_every=RETRY_EVERY):
+        self.backend = backend
+        self.cache = cache
+        self.retries = retries
+        self.backoff = backoff
+        self.coalesce = coalesce
+        self.retry_every = retry_every
+        self._pending = {}  # key -> op
+        self._failed = {}   # key -> (op, error)
+        self._inflight = set()
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush, 10)
+
+    def submit(self, key, df):
+        self._enqueue(key, {'op': 'save', 'df': df.copy(), 'full': df})
+
+    def submit_append(self, key, rows, full):
+        # rows: sólo las filas nuevas; full: la pestaña completa ya con ellas
+        self._enqueue(key, {'op': 'append', 'df': rows.copy(), 'full': full})
+
+    def _enqueue(self, key, op):
+        self.cache.put(key, op['full'], dirty=True, rows=op['df'] if op['op'] == 'append' else None)
+        with self._cond:
+            self._seq += 1
+            prev = self._pending.pop(key, None)
+            if prev is None and key in self._failed: prev = self._failed.pop(key)[0]
+            self._pending[key] = dict(_merge(prev, op), seq=self._seq)
+            self._cond.notify_all()
+
+    def resume(self, frames):
+        # Cambios locales recuperados de la copia en disco: se suben como reescritura completa
+        for key, df in frames.items(): self.submit(key, df)
+
+    def retry(self):
+        with self._cond:
+            self._requeue()
+            self._cond.notify_all()
+
+    def _requeue(self):
+        for key, (op, _) in self._failed.items():
+            self._pending[key] = _merge(op, self._pending[key]) if key in self._pending else op
+        self._failed.clear()
+
+    def status(self):
+        with self._cond:
+            pending = sorted(set(self._pending) | self._inflight)
+            return {'pending': pending, 'failed': {k: str(v[1]) for k, v in self._failed.items()}}
+
+    def flush(self, timeout=None):
+        # Bloquea hasta vaciar la cola (o agotar timeout). True si quedó vacía.
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._inflight:
+                left = None if end is None else end - time.monotonic()
+                if left is not None and left <= 0: return False
+                self._cond.wait(left)
+            return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    if not self._cond.wait(self.retry_every if self._failed else None): self._requeue()
+            time.sleep(self.coalesce)
+            with self._cond:
+                if not self._pending: continue
+                batch = dict(self._pending)
+                self._pending.clear()
+                self._inflight = set(batch)
+            for key in batch: self.cache.persist(key)
+            errors = self._write(batch)
+            with self._cond:
+                self._inflight = set()
+                for key, op in batch.items():
+                    err, newer = errors.get(key), self._pending.get(key)
+                    if err is not None:
+                        # Lo fallido va delante de lo que haya llegado mientras tanto
+                        if newer is None: self._failed[key] = (op, err)
+                        else: self._pending[key] = _merge(op, newer)
+                    elif newer is None: self.cache.mark_clean(key)
+                self._cond.notify_all()
+
+    def _write(self, batch):
+        # Todas las reescrituras pendientes van juntas (un batchUpdate en Sheets);
+        # las altas, una petición por pestaña. -> {key: error o None}
+        saves = {k: op['df'] for k, op in batch.items() if op['op'] == 'save'}
+        errors = {}
+        if saves:
+            err = self._attempt(lambda: self.backend.save_many(saves))
+            errors.update({k: err for k in saves})
+        for key, op in batch.items():
+            if op['op'] == 'append': errors[key] = self._attempt(lambda: self.backend.append(op['df'], key))
+        return errors
+
+    def _attempt(self, fn):
+        delay = self.backoff
+        for attempt in range(self.retries):
+            try:
+                fn()
+                return None
+            except Exception as e:
+                err = e
+                if attempt < self.retries - 1: time.sleep(delay); delay *= 2
+        return err